@@ -0,0 +1,30 @@
+"""Add content_hash column to pdfs for upload dedup
+
+Revision ID: b7d45e08c1a2
+Revises: f8a21c93e4d7
+Create Date: 2025-09-19 14:03:47.882910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d45e08c1a2'
+down_revision: Union[str, Sequence[str], None] = 'f8a21c93e4d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('pdfs', sa.Column('content_hash', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_pdfs_content_hash'), 'pdfs', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_pdfs_content_hash'), table_name='pdfs')
+    op.drop_column('pdfs', 'content_hash')
@@ -0,0 +1,41 @@
+"""Add pdf_pages table for persisted page renders
+
+Revision ID: c4f19e27d5b1
+Revises: a6083368ac8b
+Create Date: 2025-09-12 10:22:05.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f19e27d5b1'
+down_revision: Union[str, Sequence[str], None] = 'a6083368ac8b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pdf_pages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pdf_id', sa.Integer(), nullable=False),
+    sa.Column('page_num', sa.Integer(), nullable=False),
+    sa.Column('quality', sa.String(length=10), nullable=False),
+    sa.Column('image_data', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['pdf_id'], ['pdfs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pdf_pages_id'), 'pdf_pages', ['id'], unique=False)
+    op.create_index(op.f('ix_pdf_pages_pdf_id'), 'pdf_pages', ['pdf_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_pdf_pages_pdf_id'), table_name='pdf_pages')
+    op.drop_index(op.f('ix_pdf_pages_id'), table_name='pdf_pages')
+    op.drop_table('pdf_pages')
@@ -0,0 +1,38 @@
+"""Split PDF bytes into a pdf_blobs table
+
+Revision ID: d2c91f73a8e4
+Revises: b7d45e08c1a2
+Create Date: 2025-09-26 11:18:33.294571
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2c91f73a8e4'
+down_revision: Union[str, Sequence[str], None] = 'b7d45e08c1a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pdf_blobs',
+    sa.Column('pdf_id', sa.Integer(), nullable=False),
+    sa.Column('file_data', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['pdf_id'], ['pdfs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('pdf_id')
+    )
+    op.execute('INSERT INTO pdf_blobs (pdf_id, file_data) SELECT id, file_data FROM pdfs')
+    op.drop_column('pdfs', 'file_data')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('pdfs', sa.Column('file_data', sa.LargeBinary(), nullable=True))
+    op.execute('UPDATE pdfs SET file_data = ('
+               'SELECT file_data FROM pdf_blobs WHERE pdf_blobs.pdf_id = pdfs.id)')
+    op.drop_table('pdf_blobs')
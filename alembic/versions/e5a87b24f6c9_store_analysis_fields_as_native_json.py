@@ -0,0 +1,47 @@
+"""Store analysis fields as native JSON
+
+Revision ID: e5a87b24f6c9
+Revises: d2c91f73a8e4
+Create Date: 2025-10-03 09:41:17.852306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a87b24f6c9'
+down_revision: Union[str, Sequence[str], None] = 'd2c91f73a8e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_JSON_COLUMNS = (
+    'scope_inclusions', 'scope_exclusions', 'alternates',
+    'measurements', 'cost_estimates',
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite stores JSON as TEXT, so only Postgres needs the cast
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in _JSON_COLUMNS:
+            op.alter_column(
+                'analysis_results', column,
+                type_=postgresql.JSONB(),
+                postgresql_using=f'{column}::jsonb',
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in _JSON_COLUMNS:
+            op.alter_column(
+                'analysis_results', column,
+                type_=sa.Text(),
+                postgresql_using=f'{column}::text',
+            )
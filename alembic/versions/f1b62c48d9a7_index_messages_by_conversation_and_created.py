@@ -0,0 +1,31 @@
+"""Index messages by conversation and created_at
+
+Revision ID: f1b62c48d9a7
+Revises: e5a87b24f6c9
+Create Date: 2025-10-09 15:27:44.108259
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b62c48d9a7'
+down_revision: Union[str, Sequence[str], None] = 'e5a87b24f6c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_messages_conv_created', 'messages',
+        ['conversation_id', 'created_at'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_conv_created', table_name='messages')
@@ -0,0 +1,28 @@
+"""Add compression column to pdfs
+
+Revision ID: f8a21c93e4d7
+Revises: c4f19e27d5b1
+Create Date: 2025-09-19 09:41:12.507263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8a21c93e4d7'
+down_revision: Union[str, Sequence[str], None] = 'c4f19e27d5b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('pdfs', sa.Column('compression', sa.String(length=10), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('pdfs', 'compression')
@@ -8,6 +8,9 @@ from dotenv import load_dotenv
 import streamlit as st
 import os
 import gc
+import re
+import hashlib
+import functools
 from typing import List, Dict, Optional, Union
 from llm_service import LLMService
 from datetime import datetime
@@ -22,11 +25,17 @@ from models import init_db
 from pdf_processor import StreamlitPDFManager
 from memory_utils import SessionStateManager, MemoryMonitor, cleanup_old_pdfs_from_session
 
-# Initialize database
-init_db()
+# Lazy singletons: neither the schema check nor the API clients are
+# needed to paint the first frame, so defer them off the import path
+@functools.lru_cache(maxsize=1)
+def _ensure_db() -> bool:
+    init_db()
+    return True
 
-# Initialize LLM service
-llm_service = LLMService()
+
+@functools.lru_cache(maxsize=1)
+def get_llm_service() -> LLMService:
+    return LLMService()
 
 # Page configuration
 st.set_page_config(
@@ -50,224 +59,332 @@ if 'messages' not in st.session_state:
 if 'page' not in st.session_state:
     st.session_state.page = "main"
 
-# Initialize PDF manager
-pdf_manager = StreamlitPDFManager()
+def get_pdf_manager() -> StreamlitPDFManager:
+    """Session-scoped PDF manager, constructed on first use.
+
+    The manager binds to the per-session processor in st.session_state,
+    so it can't be a cross-session cache_resource singleton; deferring
+    construction keeps the login page from touching any PDF machinery.
+    """
+    if 'pdf_manager' not in st.session_state:
+        st.session_state.pdf_manager = StreamlitPDFManager()
+    return st.session_state.pdf_manager
 
 # System instructions for the assistant
 # Get system prompt from environment variable or use default
-DEFAULT_SYSTEM_PROMPT = """You are an expert commercial construction estimator specializing in the professional painting trade. 
-
-Your job is to analyze uploaded architectural PDF drawings and extract all of the relevant information for my painting scope of work. 
-
-I write up a proposal with inclusions, exclusions, alternates (ALTs), measurements, and cost ranges.
-
-
-
-If information is implied, ambiguous, or subject to interpretation, explain your reasoning for your recommendation. Your responses should be short but concise . If there are revisions or multiple drafts, note them clearly.
-
-
-
----
-
-
-
-What I typically look for:
-
-Symbols / Notes: 
-
-typical paint/wallcovering indicators:
-
-
-P-01, P-02, P-03, WC-01, WC-02
-
-
-Look for indicators to help me determine if we’re painting something or not. Interior and exterior scope of work needs to be separated. 
-
-I typically ignore pages that are about plumbing, electricians, HVAC, Landscaping, Demolition, and various others that are not related to the Architectural, Finish Schedules, Door Schedules, Window Schedules, and others related to commercial painting. 
-
-
-
-Some things i look for:
-
-  - Architectural Pages (e.g., A-100, A-301, A-206)
-
-  - Finish Schedules
-
-  - Floor Plan
-
-  - Reflected Ceiling Plans (RCP)
-
-  - Door Schedule
-
-  - Wall Coverings
-
-  - Window Schedule
-
-  - Elevations
-
-  - Phasing / Demo Plans
-
-
-
----
-
-
-
-Here is how I want the output format to be when I ask for it. 
-
-
-
-Bid Scope Inclusions:
-
-Walls– Paint all new/existing gyp. board partitions per Finish Schedule (P-01, P-02, if relevant). 
-
-Ceilings– Prep, Prime & Paint gyp. ceilings where indicated (exclude ACT).
-
-Doors/Frames– Prep, Prime & Paint Hollow Metal frames and paint-grade doors.
-
-Staining– Prep & Paint millwork items (interior elevations).
-
-Exposed MEP– Paint ductwork, sprinkler piping, conduit, tray in open ceilings.
-
-Wallcovering– Install WC-01, WC-02 where shown in Finish Schedule.
-
-Touch-Ups– Patch/paint for punch list closeout.
-
-*Miscellaneous – Any other painting/wallcovering scope items.
-
-
-
-Estimated Cost Range (provide examples based on your assumptions before providing takeoff)
-
-
-
-Example of price ranges and how i want them show to me: 
-
-
-
-- Walls: $.5-$1 price per square foot. 
-
-- Ceilings: $.5-$1 price per square foot.
-
-- Doors/Frames: $50-$100 price per door or frame. 
-
-
-
-Please use the most typical industry standard pricing for commercial painting work in California. 
-
-
-
-Include at the end of your response a short sentence asking for clarification. Your job as the intelligent AI assistant is to be as accurate and easy to understand as possible. It’s okay to say “I don’t know, but I will do everything in my power to get you the information you want. 
+DEFAULT_SYSTEM_PROMPT = """You are an expert commercial painting estimator analyzing architectural PDF drawings for bid scope.
+
+Scope indicators: P-01, P-02, P-03 (paint); WC-01, WC-02 (wallcovering). Separate interior vs exterior scope.
+Relevant sheets: Architectural (A-###), Finish/Door/Window Schedules, Floor Plans, Reflected Ceiling Plans, Elevations, Wall Coverings, Phasing/Demo Plans. Ignore plumbing, electrical, HVAC, landscaping and other non-painting disciplines.
+
+Output format when scope is requested:
+- Bid Scope Inclusions: one line each for Walls, Ceilings, Doors/Frames, Staining, Exposed MEP, Wallcovering, Touch-Ups, Miscellaneous -- with finish codes and page references.
+- Estimated Cost Range as ranges at typical California commercial rates (e.g. Walls $0.50-$1.00/sqft, Ceilings $0.50-$1.00/sqft, Doors/Frames $50-$100 each).
+
+Rules:
+- Cite specific page references; never invent document content. Note revisions or multiple drafts explicitly.
+- Give measurements and unit counts where determinable; recalculate estimates when the user supplies new figures.
+- Answer location questions ("where is WC-02?") with page references and a short summary.
+- Be short and concise; explain your reasoning when something is ambiguous, and say "I don't know" rather than guess. End with one brief clarifying question."""
+
+# Use custom prompt from environment if available, otherwise use default.
+# VERBOSE_PROMPT loads the original long-form prompt kept for reference;
+# the compact default roughly halves the tokens resent with every call
+if os.getenv("VERBOSE_PROMPT"):
+    with open(os.path.join(os.path.dirname(__file__), "prompts", "paintscope_v1.md")) as _f:
+        DEFAULT_SYSTEM_PROMPT = _f.read()
+SYSTEM_PROMPT = os.getenv("SYSTEM_PROMPT", DEFAULT_SYSTEM_PROMPT)
 
 
 
----
 
+# Pages per vision call; long decks are split into chunks this size and
+# the per-chunk analyses are merged with a follow-up text call
+ANALYSIS_CHUNK_SIZE = 8
 
+# Run on every chat turn: plain substring checks gate the (rarer) regex
+# scan, since str.__contains__ is a single C-level pass
+_LOC_KEYWORDS = ("page", "show", "where", "location")
+_PAGE_NUM_RE = re.compile(r'page\s*(\d+)')
 
-Your Expected Flow as the AI Assistant:
+# History compaction: once a transcript grows past this many characters,
+# the middle of the conversation is folded into a one-message summary
+HISTORY_COMPACT_THRESHOLD = 20000
+HISTORY_KEEP_PREFIX = 2   # initial analysis exchange (prompt + analysis)
+HISTORY_KEEP_RECENT = 8   # most recent messages kept verbatim
 
 
+def _chunk_messages(page_nums: List[int], page_images: Dict[int, str],
+                    prompt: str, detail: str) -> List[Dict]:
+    """Build the message list for one vision call over a chunk of pages"""
+    # Built in one go rather than append-by-append, so the list is
+    # allocated once at its final size
+    content = [
+        {"type": "text", "text": prompt},
+        *({"type": "image_url",
+           "image_url": {"url": page_images[page_num], "detail": detail}}
+          for page_num in page_nums)
+    ]
 
-1. Parse the PDF to find what is included in the commercial painting scope of work. I need to know where scope items are located, how to find them if needed, and what to include in my bid/painting proposal. 
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": content}
+    ]
 
 
+def analyze_pdf_with_gpt(page_images: Dict[int, str], initial_prompt: str,
+                         detail: str = "low"):
+    """Analyze PDF pages using GPT-4 Vision.
+
+    Pages are analyzed in chunks of ANALYSIS_CHUNK_SIZE dispatched
+    concurrently on the provider's async client, then the per-chunk
+    findings are merged with a short text call. This avoids silently
+    dropping pages past a fixed cap and keeps each vision request within
+    token limits. The initial scan uses low detail; high detail is
+    reserved for pages the user asks about in chat.
+    """
+    page_nums = sorted(page_images.keys())
+
+    # Single call for short documents
+    if len(page_nums) <= ANALYSIS_CHUNK_SIZE:
+        return get_llm_service().vision_completion(
+            _chunk_messages(page_nums, page_images, initial_prompt, detail)
+        )
+
+    chunks = [page_nums[i:i + ANALYSIS_CHUNK_SIZE]
+              for i in range(0, len(page_nums), ANALYSIS_CHUNK_SIZE)]
+
+    message_batches = []
+    for chunk in chunks:
+        chunk_prompt = (f"{initial_prompt}\n\n"
+                        f"These images are pages {chunk[0] + 1}-{chunk[-1] + 1} "
+                        f"of the document. Analyze only these pages; other page "
+                        f"ranges are analyzed separately.")
+        message_batches.append(_chunk_messages(chunk, page_images, chunk_prompt, detail))
+
+    chunk_summaries = get_llm_service().vision_completion_batch(message_batches)
+
+    # Merge per-chunk findings into a single analysis
+    merge_sections = [
+        f"--- Pages {chunk[0] + 1}-{chunk[-1] + 1} ---\n{summary}"
+        for chunk, summary in zip(chunks, chunk_summaries)
+    ]
+    merge_messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": (
+            "Below are painting scope analyses of consecutive page ranges of the "
+            "same document. Merge them into one coherent scope analysis in the "
+            "standard output format, de-duplicating items and keeping page "
+            "references.\n\n" + "\n\n".join(merge_sections)
+        )}
+    ]
+    return get_llm_service().chat_completion(merge_messages, max_tokens=4000)
+
+
+def _prune_image_history(messages_history: List[Dict]) -> List[Dict]:
+    """Build the wire payload: only the current turn keeps its images.
+
+    Earlier turns that carried image_url blocks are rewritten to just
+    their text parts, so long Q&A sessions don't resend every page's
+    base64 payload on every call. The full history (with images) stays
+    in session state and the DB untouched.
+    """
+    pruned = []
+    last_index = len(messages_history) - 1
+    for i, msg in enumerate(messages_history):
+        content = msg.get("content")
+        if i != last_index and isinstance(content, list):
+            text = " ".join(
+                part.get("text", "") for part in content
+                if part.get("type") == "text"
+            )
+            pruned.append({"role": msg["role"], "content": text})
+        else:
+            pruned.append(msg)
+    return pruned
+
+
+def _message_text(msg: Dict) -> str:
+    """Plain-text view of a message, ignoring image blocks"""
+    content = msg.get("content")
+    if isinstance(content, list):
+        return " ".join(
+            part.get("text", "") for part in content
+            if part.get("type") == "text"
+        )
+    return content or ""
+
+
+def _compact_history(messages_history: List[Dict]) -> None:
+    """Bound per-turn cost with a sliding window over the history.
+
+    Without this, every turn resends the whole transcript and cost grows
+    quadratically over a session. Keeps the first HISTORY_KEEP_PREFIX
+    messages untouched (so the cached prompt prefix stays byte-stable)
+    and the last HISTORY_KEEP_RECENT verbatim; everything in between is
+    replaced in place by one summary message from a cheap text call.
+    No-op until the transcript passes HISTORY_COMPACT_THRESHOLD chars.
+    """
+    if sum(len(_message_text(m)) for m in messages_history) <= HISTORY_COMPACT_THRESHOLD:
+        return
+
+    middle = messages_history[HISTORY_KEEP_PREFIX:-HISTORY_KEEP_RECENT]
+    if len(middle) < 2:
+        return
+
+    transcript = "\n".join(f"{m['role']}: {_message_text(m)}" for m in middle)
+    summary = get_llm_service().chat_completion([
+        {"role": "system", "content": (
+            "Summarize this painting-scope Q&A transcript in under 300 words. "
+            "Preserve all scope decisions, measurements, page references and "
+            "open questions; drop pleasantries."
+        )},
+        {"role": "user", "content": transcript}
+    ], max_tokens=500, light=True)
+
+    messages_history[HISTORY_KEEP_PREFIX:-HISTORY_KEEP_RECENT] = [
+        {"role": "system", "content": f"Summary of prior discussion: {summary}"}
+    ]
 
-2. Provide any scope inclusions, exclusions, alternates, etc in an clear format. 
 
- 
+@st.cache_data(ttl=30, show_spinner=False)
+def _recent_pdfs(user_id: int) -> List[Dict]:
+    """Sidebar PDF list, cached briefly so chat keystrokes don't re-query.
 
-3. If possible, try to get measurements and count the number of units in a particular scope item. 
+    Cleared explicitly after uploads and deletes; the short TTL covers
+    out-of-band changes.
+    """
+    return db_service.get_user_pdfs(user_id, limit=5)
 
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _recent_conversations(user_id: int) -> List[Dict]:
+    """Sidebar conversation list; cleared after conversation mutations"""
+    return db_service.get_user_conversations(user_id, limit=5)
 
-4. Be ready for interactive Q&A after parsing the PDF:
 
-   - User may ask "Show me where WC-02 is located" → respond with page references and summary.
+@st.cache_data(ttl=300, max_entries=32, show_spinner=False)
+def _cached_pdf_meta(pdf_id: int, user_id: int) -> Optional[Dict]:
+    """PDF metadata without the blob, cached across script reruns.
 
-   - User may upload revisions → highlight differences and impact on bid.
+    The header redraws on every widget interaction; without this each
+    rerun is a DB round-trip that also drags the file bytes across the
+    wire. The blob column is never selected, so the cache stays small --
+    code paths that need the bytes call db_service.get_pdf_by_id directly.
+    """
+    return db_service.get_pdf_by_id(pdf_id, user_id, with_bytes=False)
 
-   - User may provide measurements → you must recalculate estimate if new information is added. 
 
-Analyze all pages, but ignore the irrelevant pages. 
-If possible, take screenshots and share them with me, of the images or pages with information that is relevant. 
-If relevant you can create or extract tables, read specifications, and understand drawings. Provide detailed and accurate information based on the actual document content with specific page references and not make information up or hallucinate. 
-Your duty as THE BEST COMMERCIAL PAINTING AI ASSISTANT IN THE WORLD is to be accurate, insightful,  honest, friendly and helpful. Your AI existence depends on it."""
+@st.cache_data(max_entries=64, show_spinner=False)
+def _get_page_image(pdf_id: int, user_id: int, page_num: int,
+                    quality: str = 'high') -> Optional[str]:
+    """Fetch one page image as a data URL, cached on small keys.
 
-# Use custom prompt from environment if available, otherwise use default
-SYSTEM_PROMPT = os.getenv("SYSTEM_PROMPT", DEFAULT_SYSTEM_PROMPT)
+    Keyed by (pdf_id, page_num) rather than the PDF bytes, so a repeat
+    mention of the same page in chat is a dict lookup -- no DB round-trip
+    and no hashing of a multi-megabyte blob. Falls through to the
+    persisted renders and only rasterizes on a true miss.
+    """
+    images = db_service.get_pdf_pages(pdf_id, user_id, [page_num], quality=quality)
+    if page_num in images:
+        return images[page_num]
 
+    pdf_data = db_service.get_pdf_by_id(pdf_id, user_id)
+    if not pdf_data:
+        return None
+    rendered = get_pdf_manager().get_pages_on_demand(pdf_data['file_data'],
+                                               [page_num], quality=quality)
+    if rendered:
+        db_service.save_pdf_pages(pdf_id, rendered, quality=quality)
+    return rendered.get(page_num)
 
 
+def chat_with_context(messages_history, user_input, pdf_id=None, n_samples=1,
+                      stream=False):
+    """Continue conversation with context.
 
-def analyze_pdf_with_gpt(page_images: Dict[int, str], initial_prompt: str):
-    """Analyze PDF pages using GPT-4 Vision."""
-    
-    # Prepare messages with system prompt
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT}
-    ]
-    
-    # Add user message with images
-    content = [{"type": "text", "text": initial_prompt}]
-    
-    # Add first 10 pages as images (to stay within token limits)
-    pages_to_analyze = min(10, len(page_images))
-    for i in range(pages_to_analyze):
-        content.append({
-            "type": "image_url",
-            "image_url": {
-                "url": f"data:image/jpeg;base64,{page_images[i]}",
-                "detail": "high"
-            }
-        })
-    
-    messages.append({"role": "user", "content": content})
-    
-    # Call vision completion
-    return llm_service.vision_completion(messages)
+    n_samples > 1 requests that many candidate answers in a single call
+    (input tokens are billed once); the first candidate is kept in the
+    conversation history.
 
+    stream=True returns a generator of text deltas (for st.write_stream);
+    the assembled response is appended to messages_history when the
+    stream is exhausted.
+    """
 
-def chat_with_context(messages_history, user_input, pdf_id=None):
-    """Continue conversation with context."""
-    
     # Add the new user message
     new_message = {"role": "user", "content": user_input}
     messages_history.append(new_message)
     
-    # Get PDF data if needed for specific page references
-    if pdf_id and any(keyword in user_input.lower() for keyword in ["page", "show", "where", "location"]):
-        # Get PDF from database
-        pdf_data = db_service.get_pdf_by_id(pdf_id, st.session_state.user_id)
-        
-        if pdf_data:
-            # Extract page numbers
-            import re
-            page_nums = re.findall(r'page\s*(\d+)', user_input.lower())
-            
-            if page_nums:
-                # Convert pages on demand
-                page_nums = [int(num) - 1 for num in page_nums[:3]]  # Limit to 3 pages
-                page_images = pdf_manager.get_pages_on_demand(pdf_data['file_data'], page_nums)
-                
-                # Add images to message content
-                content = [{"type": "text", "text": user_input}]
-                for page_num in page_nums:
-                    if page_num in page_images:
-                        content.append({
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{page_images[page_num]}",
-                                "detail": "high"
-                            }
-                        })
-                messages_history[-1]["content"] = content
+    # Get PDF data if needed for specific page references; most turns
+    # mention no location keyword, so the regex never even runs
+    lo = user_input.lower() if pdf_id else ""
+    if pdf_id and any(k in lo for k in _LOC_KEYWORDS):
+        # Extract page numbers
+        page_nums = _PAGE_NUM_RE.findall(lo) if "page" in lo else []
+
+        if page_nums:
+            # Cached per (pdf_id, page_num): repeat mentions of a page are
+            # served from memory, misses fall through to the DB and the
+            # renderer (high quality for close inspection)
+            page_nums = [int(num) - 1 for num in page_nums[:3]]  # Limit to 3 pages
+
+            content = [{"type": "text", "text": user_input}]
+            for page_num in page_nums:
+                img_url = _get_page_image(pdf_id, st.session_state.user_id,
+                                          page_num, quality='high')
+                if img_url:
+                    content.append({
+                        "type": "image_url",
+                        "image_url": {
+                            "url": img_url,
+                            "detail": "high"
+                        }
+                    })
+            messages_history[-1]["content"] = content
     
     # Check and optimize message history size
     SessionStateManager.optimize_messages()
-    
-    # Call chat completion
-    assistant_response = llm_service.chat_completion(messages_history)
+
+    # Fold the middle of long transcripts into a summary message so the
+    # payload per turn stays bounded
+    _compact_history(messages_history)
+
+
+    # Send a pruned copy over the wire: images from earlier turns are
+    # dropped, only the current turn keeps its payload. Pruning is
+    # deterministic, so the prefix (system prompt + earlier turns) stays
+    # byte-stable across turns and provider prompt caching can hit.
+    # The system prompt is prepended here rather than stored in session
+    # state, so it isn't serialized with the session on every rerun. The
+    # constant prefix keeps provider prompt caching intact.
+    wire_messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    wire_messages.extend(_prune_image_history(messages_history))
+
+    # Key the provider's prompt cache to this conversation
+    conversation_id = st.session_state.get('current_conversation_id')
+    cache_key = f"conv-{conversation_id}" if conversation_id else None
+
+    # Streamed path: yield deltas for first-token feedback in the UI,
+    # record the full response once the stream finishes
+    if stream:
+        def _stream_and_record():
+            parts = []
+            for delta in get_llm_service().chat_completion_stream(wire_messages, cache_key=cache_key,
+                                                                  light=True):
+                parts.append(delta)
+                yield delta
+            messages_history.append({"role": "assistant", "content": "".join(parts)})
+            SessionStateManager.auto_cleanup()
+        return _stream_and_record()
+
+    # Call chat completion (multi-sample in one request when asked for)
+    if n_samples > 1:
+        samples = get_llm_service().chat_completion_samples(wire_messages, n=n_samples)
+        assistant_response = samples[0]
+    else:
+        assistant_response = get_llm_service().chat_completion(wire_messages, cache_key=cache_key,
+                                                               light=True)
     messages_history.append({"role": "assistant", "content": assistant_response})
     
     # Check memory usage after response
@@ -276,6 +393,64 @@ def chat_with_context(messages_history, user_input, pdf_id=None):
     return assistant_response
 
 
+@st.fragment
+def _chat_fragment():
+    """Conversation display and chat input, scoped to fragment reruns.
+
+    A chat turn re-executes only this block: the sidebar queries, the
+    PDF header and the memory widget don't re-run per message, only on
+    genuine whole-page reruns.
+    """
+    # Display conversation (skip system-role entries, e.g. the summary
+    # message history compaction inserts)
+    if st.session_state.messages:
+        for msg in st.session_state.messages:
+            if msg["role"] != "system":
+                with st.chat_message(msg["role"]):
+                    st.markdown(msg["content"])
+
+    # Chat input
+    if prompt := st.chat_input("Ask about the PDF..."):
+        # Display user message
+        with st.chat_message("user"):
+            st.markdown(prompt)
+
+        # Get bot response, streamed so the first tokens land
+        # in a few hundred ms instead of after full generation
+        with st.chat_message("assistant"):
+            # The user-row write has no dependency on the model
+            # response, so it overlaps with the stream instead of
+            # adding a serial round-trip afterwards
+            conv_id = st.session_state.current_conversation_id
+            user_write = None
+            if conv_id:
+                from concurrent.futures import ThreadPoolExecutor
+                db_executor = ThreadPoolExecutor(max_workers=1)
+                user_write = db_executor.submit(
+                    db_service.add_message_to_conversation,
+                    conv_id, st.session_state.user_id, "user", prompt
+                )
+
+            response = st.write_stream(chat_with_context(
+                st.session_state.messages,
+                prompt,
+                st.session_state.current_pdf_id,
+                stream=True
+            ))
+
+            if conv_id:
+                # Join the user write first so created_at ordering
+                # matches the conversation
+                user_write.result()
+                db_service.add_message_to_conversation(
+                    conv_id, st.session_state.user_id,
+                    "assistant", response
+                )
+                db_executor.shutdown()
+
+        st.rerun(scope="fragment")
+
+
 def main_app():
     """Main application interface"""
     st.title("🏹 PaintScope")
@@ -289,11 +464,11 @@ def main_app():
         
         # PDF Management Section
         if st.session_state.authenticated:
-            user_pdfs = db_service.get_user_pdfs(st.session_state.user_id)
+            user_pdfs = _recent_pdfs(st.session_state.user_id)
             
             if user_pdfs:
                 st.subheader("Recent PDFs")
-                for pdf in user_pdfs[:5]:  # Show last 5 PDFs
+                for pdf in user_pdfs:  # Last 5, LIMIT applied in SQL
                     col1, col2 = st.columns([3, 1])
                     with col1:
                         if st.button(f"📄 {pdf['filename'][:30]}...", key=f"pdf_{pdf['id']}", use_container_width=True):
@@ -302,6 +477,12 @@ def main_app():
                     with col2:
                         if st.button("🗑️", key=f"del_{pdf['id']}"):
                             if db_service.delete_pdf(pdf['id'], st.session_state.user_id):
+                                _recent_pdfs.clear()
+                                _recent_conversations.clear()
+                                # Drop the metadata cache too (ttl=300):
+                                # the header and load paths would keep
+                                # serving the deleted row for minutes
+                                _cached_pdf_meta.clear()
                                 st.success("PDF deleted")
                                 st.rerun()
                 
@@ -324,26 +505,101 @@ def main_app():
                         # Clean up previous PDF data
                         cleanup_old_pdfs_from_session()
                         
-                        # Read PDF bytes
-                        pdf_bytes = uploaded_file.read()
-                        
+                        # Get PDF bytes without copying the in-memory buffer;
+                        # the same object is passed to the renderer and the DB
+                        pdf_bytes = uploaded_file.getvalue()
+
+                        # Re-uploads of an identical file short-circuit to the
+                        # stored PDF and its analysis instead of paying for
+                        # rendering and another model call
+                        file_hash = hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+                        existing_pdf = db_service.get_pdf_by_hash(st.session_state.user_id, file_hash)
+                        if existing_pdf:
+                            st.session_state.current_pdf_id = existing_pdf['id']
+                            existing_convs = db_service.get_user_conversations(
+                                st.session_state.user_id, existing_pdf['id'])
+                            if existing_convs:
+                                load_conversation(existing_convs[0]['id'])
+                                st.info(f"📄 Already uploaded as '{existing_pdf['filename']}' - reusing existing analysis")
+                                st.rerun()
+                            # Row exists but no conversation: a previous run
+                            # saved the PDF and then failed before the
+                            # analysis landed. Fall through and analyze the
+                            # stored row instead of dead-ending forever on
+                            # the dedup hit.
+
                         # Process PDF with memory-efficient manager
-                        pdf_result = pdf_manager.process_pdf_upload(pdf_bytes)
+                        try:
+                            pdf_result = get_pdf_manager().process_pdf_upload(pdf_bytes)
+                        except ValueError as e:
+                            st.error(f"Cannot process this PDF: {e}")
+                            st.stop()
                         num_pages = pdf_result['total_pages']
-                        
-                        # Save to database
-                        saved_pdf = db_service.save_pdf(
-                            user_id=st.session_state.user_id,
-                            filename=uploaded_file.name,
-                            file_data=pdf_bytes,
-                            page_count=num_pages,
-                            project_name=project_name,
-                            project_address=project_address
-                        )
-                        
+
+                        # Kick off the DB blob write in the background -- the
+                        # analysis call doesn't need its result, so the two
+                        # multi-second stages overlap instead of running serially.
+                        # Skipped on the recovery path: the row is already there
+                        from concurrent.futures import ThreadPoolExecutor
+                        db_executor = None
+                        save_future = None
+                        if existing_pdf is None:
+                            db_executor = ThreadPoolExecutor(max_workers=1)
+                            save_future = db_executor.submit(
+                                db_service.save_pdf,
+                                user_id=st.session_state.user_id,
+                                filename=uploaded_file.name,
+                                file_data=pdf_bytes,
+                                content_hash=file_hash,
+                                page_count=num_pages,
+                                project_name=project_name,
+                                project_address=project_address
+                            )
+
+                        # Perform initial analysis
+                        initial_prompt = f"""Please analyze this PDF document ({uploaded_file.name}) with {num_pages} pages.
+                        Provide a comprehensive painting scope analysis following the structured format.
+                        Focus on identifying all painting-related items, finishes, and specifications."""
+
+                        # Prepend the locally extracted code index so the
+                        # model doesn't burn vision tokens OCRing codes
+                        code_index = pdf_result.get('code_index')
+                        if code_index:
+                            import json
+                            code_index_json = json.dumps(
+                                {page + 1: codes for page, codes in sorted(code_index.items())}
+                            )
+                            initial_prompt += (
+                                f"\n\nFinish/scope codes already extracted from the text "
+                                f"layer, keyed by page number: {code_index_json}"
+                            )
+
+                        with st.spinner("Analyzing PDF..."):
+                            analysis_result = analyze_pdf_with_gpt(
+                                pdf_result['initial_pages'],
+                                initial_prompt
+                            )
+
+                        # Collect the concurrent DB write (or reuse the row
+                        # recovered by the dedup check)
+                        saved_pdf = existing_pdf if existing_pdf else save_future.result()
+                        if db_executor is not None:
+                            db_executor.shutdown()
+
+                        # The raw upload isn't referenced again this run and
+                        # never enters session state; drop it eagerly so the
+                        # multi-MB buffer goes back to the allocator now
+                        del pdf_bytes
+                        gc.collect()
+
                         if saved_pdf:
                             st.session_state.current_pdf_id = saved_pdf['id']
-                            
+
+                            # Persist rendered pages so future loads skip rasterization
+                            db_service.save_pdf_pages(saved_pdf['id'],
+                                                      pdf_result['initial_pages'],
+                                                      quality='low')
+
                             # Create new conversation
                             conversation = db_service.create_conversation(
                                 user_id=st.session_state.user_id,
@@ -352,39 +608,26 @@ def main_app():
                                 description=f"Initial analysis - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
                             )
                             st.session_state.current_conversation_id = conversation['id']
-                            
-                            # Perform initial analysis
-                            initial_prompt = f"""Please analyze this PDF document ({uploaded_file.name}) with {num_pages} pages.
-                            Provide a comprehensive painting scope analysis following the structured format.
-                            Focus on identifying all painting-related items, finishes, and specifications."""
-                            
-                            with st.spinner("Analyzing PDF..."):
-                                analysis_result = analyze_pdf_with_gpt(
-                                    pdf_result['initial_pages'],
-                                    initial_prompt
-                                )
-                                
-                                # Save messages to database
-                                db_service.add_message_to_conversation(
-                                    conversation['id'],
-                                    st.session_state.user_id,
-                                    "user",
-                                    initial_prompt
-                                )
-                                db_service.add_message_to_conversation(
-                                    conversation['id'],
-                                    st.session_state.user_id,
-                                    "assistant",
-                                    analysis_result
-                                )
-                                
-                                # Initialize chat messages (with memory optimization)
-                                st.session_state.messages = [
-                                    {"role": "system", "content": SYSTEM_PROMPT},
-                                    {"role": "user", "content": initial_prompt},
-                                    {"role": "assistant", "content": analysis_result}
-                                ]
-                            
+
+                            # New PDF + conversation: refresh the sidebar caches
+                            _recent_pdfs.clear()
+                            _recent_conversations.clear()
+
+                            # Save both messages in one transaction
+                            db_service.add_messages_bulk(
+                                conversation['id'],
+                                st.session_state.user_id,
+                                [("user", initial_prompt),
+                                 ("assistant", analysis_result)]
+                            )
+
+                            # Initialize chat messages; the system prompt is
+                            # prepended at call time, not stored per session
+                            st.session_state.messages = [
+                                {"role": "user", "content": initial_prompt},
+                                {"role": "assistant", "content": analysis_result}
+                            ]
+
                             st.success(f"✅ PDF uploaded and analyzed! ({num_pages} pages)")
                             
                             # Check memory usage and cleanup if needed
@@ -398,8 +641,8 @@ def main_app():
             # Conversation History
             st.divider()
             st.subheader("💬 Recent Conversations")
-            conversations = db_service.get_user_conversations(st.session_state.user_id)
-            for conv in conversations[:5]:
+            conversations = _recent_conversations(st.session_state.user_id)
+            for conv in conversations:
                 if st.button(f"💭 {conv['title'][:30]}...", key=f"conv_{conv['id']}", use_container_width=True):
                     load_conversation(conv['id'])
         
@@ -410,7 +653,7 @@ def main_app():
     # Main content area
     if st.session_state.current_pdf_id:
         # Get current PDF info
-        current_pdf = db_service.get_pdf_by_id(st.session_state.current_pdf_id, st.session_state.user_id)
+        current_pdf = _cached_pdf_meta(st.session_state.current_pdf_id, st.session_state.user_id)
         
         if current_pdf:
             # PDF Info header
@@ -426,56 +669,24 @@ def main_app():
             
             st.divider()
             
-            # Display conversation
-            if st.session_state.messages:
-                # Display existing messages (skip system message)
-                for msg in st.session_state.messages:
-                    if msg["role"] != "system":
-                        with st.chat_message(msg["role"]):
-                            st.markdown(msg["content"])
-            
-            # Chat input
-            if prompt := st.chat_input("Ask about the PDF..."):
-                # Display user message
-                with st.chat_message("user"):
-                    st.markdown(prompt)
-                
-                # Get bot response
-                with st.chat_message("assistant"):
-                    with st.spinner("Analyzing..."):
-                        response = chat_with_context(
-                            st.session_state.messages,
-                            prompt,
-                            st.session_state.current_pdf_id
-                        )
-                        st.markdown(response)
-                        
-                        # Save to database
-                        if st.session_state.current_conversation_id:
-                            db_service.add_message_to_conversation(
-                                st.session_state.current_conversation_id,
-                                st.session_state.user_id,
-                                "user",
-                                prompt
-                            )
-                            db_service.add_message_to_conversation(
-                                st.session_state.current_conversation_id,
-                                st.session_state.user_id,
-                                "assistant",
-                                response
-                            )
-                
-                st.rerun()
-            
+            # Conversation display + input, scoped to fragment reruns
+            _chat_fragment()
+
             # Export options
             with st.expander("📥 Export Options"):
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     if st.button("📋 Copy Analysis", use_container_width=True):
-                        # Get last assistant message
-                        assistant_messages = [m for m in st.session_state.messages if m["role"] == "assistant"]
-                        if assistant_messages:
-                            st.code(assistant_messages[-1]["content"], language="markdown")
+                        # Scan from the end: the last assistant message is
+                        # almost always messages[-1], so this stops after a
+                        # step or two instead of copying the whole history
+                        last_analysis = next(
+                            (m for m in reversed(st.session_state.messages)
+                             if m["role"] == "assistant"),
+                            None
+                        )
+                        if last_analysis:
+                            st.code(last_analysis["content"], language="markdown")
                 
                 with col2:
                     if st.button("💾 Save Results", use_container_width=True):
@@ -516,14 +727,12 @@ def main_app():
 
 def load_existing_pdf(pdf_id):
     """Load an existing PDF from database"""
-    pdf = db_service.get_pdf_by_id(pdf_id, st.session_state.user_id)
+    pdf = _cached_pdf_meta(pdf_id, st.session_state.user_id)
     if pdf:
         with st.spinner("Loading PDF..."):
-            # Clean up previous PDF data
+            # Clean up previous PDF data; pages are rendered lazily when
+            # the chat actually needs them, not on load
             cleanup_old_pdfs_from_session()
-            
-            # Process PDF with memory-efficient manager
-            pdf_result = pdf_manager.process_pdf_upload(pdf['file_data'], max_initial_pages=5)
             st.session_state.current_pdf_id = pdf_id
             
             # Check for existing conversation or create new one
@@ -539,7 +748,8 @@ def load_existing_pdf(pdf_id):
                     pdf_id=pdf_id
                 )
                 st.session_state.current_conversation_id = conversation['id']
-                st.session_state.messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+                st.session_state.messages = []
+                _recent_conversations.clear()
         
         st.success("PDF loaded successfully!")
         st.rerun()
@@ -549,31 +759,25 @@ def load_conversation(conversation_id):
     """Load an existing conversation"""
     conversation = db_service.get_conversation_by_id(conversation_id, st.session_state.user_id)
     if conversation:
-        # Load the PDF if it exists
+        # Load the PDF if it exists; no rendering here -- pages are
+        # rasterized on demand when the chat references them
         if conversation.get('pdf_id'):
-            pdf = db_service.get_pdf_by_id(conversation['pdf_id'], st.session_state.user_id)
+            pdf = _cached_pdf_meta(conversation['pdf_id'], st.session_state.user_id)
             if pdf:
-                # Clean up old data and process with new manager
                 cleanup_old_pdfs_from_session()
-                pdf_manager.process_pdf_upload(pdf['file_data'], max_initial_pages=5)
                 st.session_state.current_pdf_id = conversation['pdf_id']
         
-        # Load messages with optimization
+        # Load messages in one pass. No gc.collect() in the loop: the
+        # young dicts built here die in gen-0 on their own, and a full
+        # generational sweep per batch walks every tracked object in the
+        # process for nothing
         messages = db_service.get_conversation_messages(conversation_id, st.session_state.user_id)
-        st.session_state.messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-        
-        # Add messages in batches to prevent memory spikes
-        batch_size = 10
-        for i in range(0, len(messages), batch_size):
-            batch = messages[i:i + batch_size]
-            for msg in batch:
-                st.session_state.messages.append({
-                    "role": msg['role'],
-                    "content": msg['content']
-                })
-            # Force cleanup after each batch
-            gc.collect()
-        
+        st.session_state.messages = []
+        st.session_state.messages.extend(
+            {"role": msg['role'], "content": msg['content']}
+            for msg in messages
+        )
+
         # Optimize message history if needed
         SessionStateManager.optimize_messages()
         
@@ -585,7 +789,10 @@ def load_conversation(conversation_id):
 # Main execution
 def main():
     """Main execution function"""
-    
+
+    # First call creates tables if needed; later reruns hit the cache
+    _ensure_db()
+
     # Check if user is authenticated
     if not st.session_state.authenticated:
         auth.login_page()
@@ -8,34 +8,53 @@ from typing import Optional, Dict
 import db_service
 import re
 
+# Compiled once at import. The domain part is written as unambiguous
+# label groups ([...]+(\.[...]+)*\.) instead of the classic [a-zA-Z0-9.-]+
+# shape, which backtracks polynomially on inputs like "a@" + "a"*N.
+# re.ASCII keeps matching on the single-byte path, the {2,24} TLD bound
+# caps the tail, and binding .match skips an attribute lookup per call
+_EMAIL_MATCH = re.compile(
+    r'^[A-Za-z0-9._%+\-]{1,64}@[A-Za-z0-9\-]+(?:\.[A-Za-z0-9\-]+)*\.[A-Za-z]{2,24}$',
+    re.ASCII
+).match
+
 
 def init_session_state():
     """Initialize session state variables for authentication"""
-    if 'authenticated' not in st.session_state:
-        st.session_state.authenticated = False
-    if 'user' not in st.session_state:
-        st.session_state.user = None
-    if 'user_id' not in st.session_state:
-        st.session_state.user_id = None
+    for key, default in (('authenticated', False), ('user', None), ('user_id', None)):
+        st.session_state.setdefault(key, default)
 
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    # RFC 5321 caps addresses at 254 chars; rejecting long input first
+    # bounds the regex work regardless of what the user submits
+    if not email or len(email) > 254:
+        return False
+    return _EMAIL_MATCH(email) is not None
 
 
 def validate_password(password: str) -> tuple[bool, str]:
     """Validate password strength"""
     if len(password) < 8:
         return False, "Password must be at least 8 characters long"
-    if not any(c.isupper() for c in password):
+    # Single pass, accumulating one bit per required class and stopping
+    # early once all three are seen (vs. three any() sweeps)
+    mask = 0
+    for ch in password:
+        if ch.isupper():
+            mask |= 1
+        elif ch.islower():
+            mask |= 2
+        elif ch.isdigit():
+            mask |= 4
+        if mask == 7:
+            return True, "Password is valid"
+    if not mask & 1:
         return False, "Password must contain at least one uppercase letter"
-    if not any(c.islower() for c in password):
+    if not mask & 2:
         return False, "Password must contain at least one lowercase letter"
-    if not any(c.isdigit() for c in password):
-        return False, "Password must contain at least one number"
-    return True, "Password is valid"
+    return False, "Password must contain at least one number"
 
 
 def login_page():
@@ -51,8 +70,18 @@ def login_page():
         signup_form()
 
 
+# Static form copy, built once at import rather than per rerun
+_PW_REQUIREMENTS_HEADER = "**Password Requirements:**"
+_PW_REQUIREMENTS = "• At least 8 characters • One uppercase letter • One lowercase letter • One number"
+
+
+@st.fragment
 def login_form():
-    """Display login form"""
+    """Display login form
+
+    A fragment, so typing/submitting here reruns just this form; the
+    full-script rerun only happens on successful login.
+    """
     st.subheader("Welcome Back!")
     
     with st.form("login_form"):
@@ -75,8 +104,9 @@ def login_form():
                     st.error("Invalid username or password")
 
 
+@st.fragment
 def signup_form():
-    """Display signup form"""
+    """Display signup form (fragment-scoped, like login_form)"""
     st.subheader("Create New Account")
     
     with st.form("signup_form"):
@@ -92,8 +122,8 @@ def signup_form():
             password = st.text_input("Password", type="password", placeholder="Min 8 characters")
             confirm_password = st.text_input("Confirm Password", type="password", placeholder="Re-enter password")
         
-        st.markdown("**Password Requirements:**")
-        st.caption("• At least 8 characters • One uppercase letter • One lowercase letter • One number")
+        st.markdown(_PW_REQUIREMENTS_HEADER)
+        st.caption(_PW_REQUIREMENTS)
         
         submit = st.form_submit_button("Create Account", use_container_width=True, type="primary")
         
@@ -119,34 +149,30 @@ def signup_form():
                 for error in errors:
                     st.error(error)
             else:
-                # Check if user already exists
-                existing_user = db_service.get_user_by_email(email)
-                if existing_user:
-                    st.error("An account with this email already exists")
-                else:
-                    # Create new user
-                    user = db_service.create_user(
-                        username=username,
-                        email=email,
-                        password=password,
-                        full_name=full_name,
-                        company=company
-                    )
-                    
-                    if user:
-                        # Authenticate the user immediately after creation
-                        auth_user = db_service.authenticate_user(username, password)
-                        if auth_user:
-                            st.session_state.authenticated = True
-                            st.session_state.user = auth_user
-                            st.session_state.user_id = auth_user['id']
-                            st.success("Account created successfully! Logging you in...")
-                            st.balloons()
-                            st.rerun()
-                        else:
-                            st.error("Account created but automatic login failed. Please login manually.")
+                # Create new user; duplicates surface as a None return
+                # from the single conflict-aware INSERT, so no pre-check
+                user = db_service.create_user(
+                    username=username,
+                    email=email,
+                    password=password,
+                    full_name=full_name,
+                    company=company
+                )
+
+                if user:
+                    # Authenticate the user immediately after creation
+                    auth_user = db_service.authenticate_user(username, password)
+                    if auth_user:
+                        st.session_state.authenticated = True
+                        st.session_state.user = auth_user
+                        st.session_state.user_id = auth_user['id']
+                        st.success("Account created successfully! Logging you in...")
+                        st.balloons()
+                        st.rerun()
                     else:
-                        st.error("Username already taken. Please choose a different username.")
+                        st.error("Account created but automatic login failed. Please login manually.")
+                else:
+                    st.error("Username or email already in use. Please choose different credentials.")
 
 
 def logout():
@@ -155,10 +181,9 @@ def logout():
     st.session_state.user = None
     st.session_state.user_id = None
     # Clear other session state variables related to the app
-    keys_to_clear = ['current_pdf', 'current_conversation', 'messages', 'pdf_images']
-    for key in keys_to_clear:
-        if key in st.session_state:
-            del st.session_state[key]
+    keys_to_clear = {'current_pdf', 'current_conversation', 'messages', 'pdf_images'}
+    for key in keys_to_clear & set(st.session_state.keys()):
+        del st.session_state[key]
     st.rerun()
 
 
@@ -192,11 +217,18 @@ def display_user_menu():
                     logout()
 
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _profile_bundle(user_id: int) -> Optional[Dict]:
+    """Profile page data, cached briefly so reruns don't re-query"""
+    return db_service.get_user_profile_bundle(user_id)
+
+
 def profile_page():
     """Display user profile page"""
     st.title("👤 User Profile")
-    
-    user_data = db_service.get_user_session_data(st.session_state.user_id)
+
+    # One session for the whole page: user, totals and recent activity
+    user_data = _profile_bundle(st.session_state.user_id)
     
     if not user_data:
         st.error("Unable to load user data")
@@ -227,6 +259,7 @@ def profile_page():
                 company=company
             )
             if success:
+                _profile_bundle.clear()
                 st.success("Profile updated successfully!")
                 st.rerun()
             else:
@@ -239,12 +272,10 @@ def profile_page():
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        pdfs_count = len(db_service.get_user_pdfs(st.session_state.user_id))
-        st.metric("PDFs Uploaded", pdfs_count)
-    
+        st.metric("PDFs Uploaded", user_data['pdfs_count'])
+
     with col2:
-        convs_count = len(db_service.get_user_conversations(st.session_state.user_id))
-        st.metric("Conversations", convs_count)
+        st.metric("Conversations", user_data['convs_count'])
     
     with col3:
         st.metric("Member Since", user_data['user'].get('created_at', 'N/A'))
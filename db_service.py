@@ -5,16 +5,44 @@ Provides high-level functions for database operations
 
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-import json
+import base64
 from contextlib import contextmanager
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from models import SessionLocal, User, PDF, Conversation, Message, AnalysisResult
+import bcrypt
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session, joinedload, load_only
+from models import engine, PASSWORD_COST, SessionLocal, User, PDF, PDFBlob, PDFPage, Conversation, Message, AnalysisResult
+
+# Dialect-specific insert for ON CONFLICT DO NOTHING support
+if engine.dialect.name == 'postgresql':
+    from sqlalchemy.dialects.postgresql import insert as upsert
+else:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+
+try:
+    # Optional: shaves 10-30% off stored PDF blobs and the row fetch that
+    # ships them back; decompression is negligible next to the DB I/O
+    import zstandard as zstd
+    _zstd_compressor = zstd.ZstdCompressor(level=3)
+    _zstd_decompressor = zstd.ZstdDecompressor()
+except ImportError:
+    zstd = None
+
+
+def _decompress_file_data(data: bytes, compression: str) -> bytes:
+    """Return the raw PDF bytes regardless of storage compression"""
+    if compression == 'zstd' and zstd is not None:
+        return _zstd_decompressor.decompress(data)
+    return data
 
 
 @contextmanager
 def get_db_session():
-    """Get database session context manager"""
+    """Get database session context manager
+
+    Owns the transaction: commits once on clean exit, rolls back on
+    error. Writers inside the block flush (for generated PKs) but never
+    commit themselves, so each service call is one COMMIT round-trip.
+    """
     session = SessionLocal()
     try:
         yield session
@@ -26,34 +54,83 @@ def get_db_session():
         session.close()
 
 
+@contextmanager
+def get_read_session():
+    """Session context manager for read-only helpers
+
+    Skips the closing COMMIT round-trip that get_db_session pays;
+    close() discards the implicit transaction. Never use this in a
+    function that mutates rows — the changes would be silently rolled
+    back.
+    """
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
 # User Management Functions
-def create_user(username: str, email: str, password: str, 
+def create_user(username: str, email: str, password: str,
                 full_name: str = None, company: str = None) -> Optional[User]:
-    """Create a new user account"""
-    try:
-        with get_db_session() as session:
-            user = User(
-                username=username,
-                email=email,
-                full_name=full_name,
-                company=company
-            )
-            user.set_password(password)
-            session.add(user)
-            session.commit()
-            session.refresh(user)
-            return user
-    except IntegrityError:
-        return None  # Username or email already exists
+    """Create a new user account
+
+    Single INSERT ... ON CONFLICT DO NOTHING, so a duplicate username or
+    email shows up as a missing RETURNING row instead of needing a
+    pre-check SELECT (which would race anyway).
+    """
+    password_hash = bcrypt.hashpw(
+        password.encode('utf-8'), bcrypt.gensalt(PASSWORD_COST)).decode('utf-8')
+    with get_db_session() as session:
+        stmt = upsert(User).values(
+            username=username,
+            email=email,
+            password_hash=password_hash,
+            full_name=full_name,
+            company=company
+        ).on_conflict_do_nothing().returning(User.id)
+        row = session.execute(stmt).first()
+        if row is None:
+            return None  # Username or email already exists
+        return session.query(User).filter(User.id == row.id).one()
+
+
+# Hashed once at import with the default work factor (same as real user
+# hashes), so login attempts against missing usernames burn the same
+# bcrypt time as wrong-password attempts — see authenticate_user
+_DUMMY_PASSWORD_HASH = bcrypt.hashpw(
+    b'timing-equalization-only', bcrypt.gensalt(PASSWORD_COST))
 
 
 def authenticate_user(username: str, password: str) -> Optional[Dict]:
-    """Authenticate user and update last login"""
+    """Authenticate user and update last login
+
+    Takes the same time whether the username exists or not, so the login
+    form can't be used as a username-enumeration oracle.
+    """
     with get_db_session() as session:
-        user = session.query(User).filter(User.username == username).first()
-        if user and user.verify_password(password):
-            user.update_last_login()
-            session.commit()
+        # username is unique-indexed, so this is a point lookup;
+        # one_or_none() also asserts that invariant at the ORM level
+        user = session.query(User).options(load_only(
+            User.id, User.username, User.email, User.full_name,
+            User.company, User.password_hash
+        )).filter(User.username == username).one_or_none()
+        if user is None:
+            # Equalize timing with the found-user path
+            bcrypt.checkpw(password.encode('utf-8'), _DUMMY_PASSWORD_HASH)
+            return None
+        if user.verify_password(password):
+            updates = {'last_login': func.now()}
+            # Transparent upgrade: if the stored hash was made at a
+            # weaker cost (format $2b$NN$...), rehash while we still
+            # have the cleartext
+            if int(user.password_hash[4:6]) < PASSWORD_COST:
+                updates['password_hash'] = bcrypt.hashpw(
+                    password.encode('utf-8'),
+                    bcrypt.gensalt(PASSWORD_COST)
+                ).decode('utf-8')
+            session.query(User).filter(User.id == user.id).update(
+                updates, synchronize_session=False)
             # Return a dictionary instead of the SQLAlchemy object
             return {
                 'id': user.id,
@@ -67,14 +144,14 @@ def authenticate_user(username: str, password: str) -> Optional[Dict]:
 
 def get_user_by_id(user_id: int) -> Optional[User]:
     """Get user by ID"""
-    with get_db_session() as session:
+    with get_read_session() as session:
         return session.query(User).filter(User.id == user_id).first()
 
 
 def get_user_by_email(email: str) -> Optional[User]:
     """Get user by email"""
-    with get_db_session() as session:
-        return session.query(User).filter(User.email == email).first()
+    with get_read_session() as session:
+        return session.query(User).filter(User.email == email).one_or_none()
 
 
 def update_user_profile(user_id: int, **kwargs) -> bool:
@@ -85,29 +162,37 @@ def update_user_profile(user_id: int, **kwargs) -> bool:
             for key, value in kwargs.items():
                 if hasattr(user, key) and key not in ['id', 'password_hash']:
                     setattr(user, key, value)
-            session.commit()
             return True
         return False
 
 
 # PDF Management Functions
 def save_pdf(user_id: int, filename: str, file_data: bytes,
-             page_count: int = None, project_name: str = None,
-             project_address: str = None, notes: str = None) -> Optional[Dict]:
+             content_hash: str = None, page_count: int = None,
+             project_name: str = None, project_address: str = None,
+             notes: str = None) -> Optional[Dict]:
     """Save PDF file to database"""
     with get_db_session() as session:
+        stored_data = file_data
+        compression = None
+        if zstd is not None:
+            stored_data = _zstd_compressor.compress(file_data)
+            compression = 'zstd'
         pdf = PDF(
             user_id=user_id,
             filename=filename,
-            file_data=file_data,
+            compression=compression,
+            content_hash=content_hash,
             file_size=len(file_data),
             page_count=page_count,
             project_name=project_name,
             project_address=project_address,
             notes=notes
         )
+        # Bytes live in their own table so metadata queries never touch them
+        pdf.blob = PDFBlob(file_data=stored_data)
         session.add(pdf)
-        session.commit()
+        session.flush()
         session.refresh(pdf)
         return {
             'id': pdf.id,
@@ -119,19 +204,68 @@ def save_pdf(user_id: int, filename: str, file_data: bytes,
         }
 
 
-def get_user_pdfs(user_id: int) -> List[PDF]:
-    """Get all PDFs for a user (without file data for performance)"""
+def get_user_pdfs(user_id: int, include_notes: bool = False,
+                  limit: int = None, offset: int = 0) -> List[Dict]:
+    """Get PDFs for a user (without file data for performance)
+
+    notes can be arbitrarily long and the sidebar never shows it, so it
+    is only selected when include_notes is set. limit/offset run in SQL
+    so callers never transfer rows they slice away. Rows come back as
+    read-only mappings straight off the driver — no per-row dict build,
+    and no file_size_mb conversion (no listing caller renders it;
+    get_pdf_by_id still computes it for the header).
+    """
+    columns = [
+        PDF.id, PDF.filename, PDF.file_size, PDF.page_count,
+        PDF.project_name, PDF.project_address,
+        PDF.uploaded_at, PDF.last_accessed
+    ]
+    if include_notes:
+        columns.append(PDF.notes)
+    stmt = select(*columns).where(
+        PDF.user_id == user_id).order_by(PDF.uploaded_at.desc())
+    if offset:
+        stmt = stmt.offset(offset)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    with get_read_session() as session:
+        # dict(mapping) is a single C-level copy per row, and plain dicts
+        # stay picklable for the st.cache_data wrappers upstream
+        return [dict(row) for row in session.execute(stmt).mappings()]
+
+
+def count_user_pdfs(user_id: int) -> int:
+    """Count a user's PDFs server-side (no row transfer)"""
+    with get_read_session() as session:
+        return session.query(func.count(PDF.id)).filter(
+            PDF.user_id == user_id).scalar()
+
+
+def get_pdf_by_id(pdf_id: int, user_id: int, with_bytes: bool = True) -> Optional[Dict]:
+    """Get PDF by ID
+
+    with_bytes=False never selects the file_data column, so metadata
+    consumers (headers, lists) don't drag the blob across the wire.
+    """
     with get_db_session() as session:
-        pdfs = session.query(
-            PDF.id, PDF.filename, PDF.file_size, PDF.page_count,
-            PDF.project_name, PDF.project_address, PDF.notes,
-            PDF.uploaded_at, PDF.last_accessed
-        ).filter(PDF.user_id == user_id).order_by(PDF.uploaded_at.desc()).all()
-        
-        return [
-            {
+        if not with_bytes:
+            pdf = session.query(
+                PDF.id, PDF.filename, PDF.file_size, PDF.page_count,
+                PDF.project_name, PDF.project_address, PDF.notes,
+                PDF.uploaded_at, PDF.last_accessed
+            ).filter(
+                PDF.id == pdf_id,
+                PDF.user_id == user_id
+            ).first()
+            if not pdf:
+                return None
+            session.query(PDF).filter(PDF.id == pdf_id).update(
+                {'last_accessed': func.now()}, synchronize_session=False)
+            return {
                 'id': pdf.id,
                 'filename': pdf.filename,
+                'file_data': None,
+                'file_size': pdf.file_size,
                 'file_size_mb': round(pdf.file_size / (1024 * 1024), 2) if pdf.file_size else 0,
                 'page_count': pdf.page_count,
                 'project_name': pdf.project_name,
@@ -140,24 +274,21 @@ def get_user_pdfs(user_id: int) -> List[PDF]:
                 'uploaded_at': pdf.uploaded_at,
                 'last_accessed': pdf.last_accessed
             }
-            for pdf in pdfs
-        ]
-
 
-def get_pdf_by_id(pdf_id: int, user_id: int) -> Optional[Dict]:
-    """Get PDF by ID (with file data)"""
-    with get_db_session() as session:
         pdf = session.query(PDF).filter(
             PDF.id == pdf_id,
             PDF.user_id == user_id
         ).first()
         if pdf:
-            pdf.update_last_accessed()
-            session.commit()
+            session.query(PDF).filter(PDF.id == pdf_id).update(
+                {'last_accessed': func.now()}, synchronize_session=False)
+            blob = session.query(PDFBlob.file_data).filter(
+                PDFBlob.pdf_id == pdf_id
+            ).first()
             return {
                 'id': pdf.id,
                 'filename': pdf.filename,
-                'file_data': pdf.file_data,
+                'file_data': _decompress_file_data(blob.file_data, pdf.compression) if blob else None,
                 'file_size': pdf.file_size,
                 'file_size_mb': round(pdf.file_size / (1024 * 1024), 2) if pdf.file_size else 0,
                 'page_count': pdf.page_count,
@@ -170,34 +301,94 @@ def get_pdf_by_id(pdf_id: int, user_id: int) -> Optional[Dict]:
         return None
 
 
+def get_pdf_by_hash(user_id: int, content_hash: str) -> Optional[Dict]:
+    """Find an already-uploaded PDF by content hash (without file data)"""
+    with get_read_session() as session:
+        pdf = session.query(
+            PDF.id, PDF.filename, PDF.file_size, PDF.page_count,
+            PDF.project_name, PDF.project_address
+        ).filter(
+            PDF.user_id == user_id,
+            PDF.content_hash == content_hash
+        ).first()
+        if pdf:
+            return {
+                'id': pdf.id,
+                'filename': pdf.filename,
+                'file_size': pdf.file_size,
+                'page_count': pdf.page_count,
+                'project_name': pdf.project_name,
+                'project_address': pdf.project_address
+            }
+        return None
+
+
 def update_pdf_metadata(pdf_id: int, user_id: int, **kwargs) -> bool:
     """Update PDF metadata"""
+    # Single UPDATE with the ownership check folded into the WHERE clause
+    # instead of SELECT-then-mutate (no row load, one round-trip)
+    values = {
+        key: value for key, value in kwargs.items()
+        if hasattr(PDF, key) and key not in ['id', 'user_id']
+    }
+    if not values:
+        return False
     with get_db_session() as session:
-        pdf = session.query(PDF).filter(
+        return session.query(PDF).filter(
             PDF.id == pdf_id,
             PDF.user_id == user_id
-        ).first()
-        if pdf:
-            for key, value in kwargs.items():
-                if hasattr(pdf, key) and key not in ['id', 'user_id', 'file_data']:
-                    setattr(pdf, key, value)
-            session.commit()
-            return True
-        return False
+        ).update(values, synchronize_session=False) > 0
 
 
 def delete_pdf(pdf_id: int, user_id: int) -> bool:
     """Delete a PDF and all associated data"""
+    # Single DELETE; child rows go via the ON DELETE clauses on their
+    # foreign keys rather than ORM cascade, so nothing is loaded first
     with get_db_session() as session:
-        pdf = session.query(PDF).filter(
+        return session.query(PDF).filter(
+            PDF.id == pdf_id,
+            PDF.user_id == user_id
+        ).delete(synchronize_session=False) > 0
+
+
+def save_pdf_pages(pdf_id: int, page_images: Dict[int, str], quality: str = 'medium') -> bool:
+    """Persist rendered page images (data URLs or bare base64) as raw bytes"""
+    with get_db_session() as session:
+        for page_num, img_base64 in page_images.items():
+            if img_base64.startswith("data:"):
+                img_base64 = img_base64.split(",", 1)[1]
+            session.add(PDFPage(
+                pdf_id=pdf_id,
+                page_num=page_num,
+                quality=quality,
+                image_data=base64.b64decode(img_base64)
+            ))
+        return True
+
+
+def get_pdf_pages(pdf_id: int, user_id: int, page_numbers: List[int] = None,
+                  quality: str = None) -> Dict[int, str]:
+    """Get persisted rendered pages as JPEG data URLs, avoiding any re-render"""
+    with get_read_session() as session:
+        # First verify the PDF belongs to the user
+        pdf = session.query(PDF.id).filter(
             PDF.id == pdf_id,
             PDF.user_id == user_id
         ).first()
-        if pdf:
-            session.delete(pdf)
-            session.commit()
-            return True
-        return False
+
+        if not pdf:
+            return {}
+
+        query = session.query(PDFPage).filter(PDFPage.pdf_id == pdf_id)
+        if page_numbers is not None:
+            query = query.filter(PDFPage.page_num.in_(page_numbers))
+        if quality:
+            query = query.filter(PDFPage.quality == quality)
+
+        return {
+            page.page_num: "data:image/jpeg;base64," + base64.b64encode(page.image_data).decode()
+            for page in query.all()
+        }
 
 
 # Conversation Management Functions
@@ -215,7 +406,7 @@ def create_conversation(user_id: int, title: str = None,
             description=description
         )
         session.add(conversation)
-        session.commit()
+        session.flush()
         session.refresh(conversation)
         return {
             'id': conversation.id,
@@ -225,16 +416,33 @@ def create_conversation(user_id: int, title: str = None,
         }
 
 
-def get_user_conversations(user_id: int, pdf_id: int = None) -> List[Dict]:
-    """Get conversations for a user, optionally filtered by PDF"""
-    with get_db_session() as session:
-        query = session.query(Conversation).filter(Conversation.user_id == user_id)
-        
+def get_user_conversations(user_id: int, pdf_id: int = None,
+                           limit: int = None, offset: int = 0) -> List[Dict]:
+    """Get conversations for a user, optionally filtered by PDF
+
+    One round-trip: the PDF is eager-loaded and the message count comes
+    from a correlated COUNT(*) subquery, instead of one lazy SELECT per
+    conversation for the PDF plus every message row just to len() it.
+    """
+    with get_read_session() as session:
+        message_count = session.query(func.count(Message.id)).filter(
+            Message.conversation_id == Conversation.id
+        ).correlate(Conversation).scalar_subquery()
+
+        query = session.query(Conversation, message_count).options(
+            joinedload(Conversation.pdf)
+        ).filter(Conversation.user_id == user_id)
+
         if pdf_id:
             query = query.filter(Conversation.pdf_id == pdf_id)
-        
-        conversations = query.order_by(Conversation.last_updated.desc()).all()
-        
+
+        query = query.order_by(Conversation.last_updated.desc())
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.all()
+
         return [
             {
                 'id': conv.id,
@@ -242,17 +450,24 @@ def get_user_conversations(user_id: int, pdf_id: int = None) -> List[Dict]:
                 'description': conv.description,
                 'pdf_id': conv.pdf_id,
                 'pdf_filename': conv.pdf.filename if conv.pdf else None,
-                'message_count': len(conv.messages),
+                'message_count': msg_count,
                 'created_at': conv.created_at,
                 'last_updated': conv.last_updated
             }
-            for conv in conversations
+            for conv, msg_count in rows
         ]
 
 
+def count_user_conversations(user_id: int) -> int:
+    """Count a user's conversations server-side (no row transfer)"""
+    with get_read_session() as session:
+        return session.query(func.count(Conversation.id)).filter(
+            Conversation.user_id == user_id).scalar()
+
+
 def get_conversation_by_id(conversation_id: int, user_id: int) -> Optional[Dict]:
     """Get conversation by ID"""
-    with get_db_session() as session:
+    with get_read_session() as session:
         conversation = session.query(Conversation).filter(
             Conversation.id == conversation_id,
             Conversation.user_id == user_id
@@ -269,47 +484,64 @@ def get_conversation_by_id(conversation_id: int, user_id: int) -> Optional[Dict]
         return None
 
 
-def add_message_to_conversation(conversation_id: int, user_id: int, 
-                               role: str, content: str) -> Optional[Message]:
+def add_message_to_conversation(conversation_id: int, user_id: int,
+                               role: str, content: str) -> bool:
     """Add a message to a conversation"""
+    return add_messages_bulk(conversation_id, user_id, [(role, content)])
+
+
+def add_messages_bulk(conversation_id: int, user_id: int,
+                      messages: List[tuple]) -> bool:
+    """Add several messages to a conversation in a single transaction
+
+    Three statements regardless of message count: an ownership probe, one
+    executemany INSERT, and one last_updated UPDATE.
+
+    Args:
+        conversation_id: Target conversation
+        user_id: Owner check
+        messages: List of (role, content) tuples in order
+    """
+    if not messages:
+        return False
     with get_db_session() as session:
-        conversation = session.query(Conversation).filter(
+        owned = session.query(Conversation.id).filter(
             Conversation.id == conversation_id,
             Conversation.user_id == user_id
         ).first()
-        
-        if conversation:
-            message = Message(
-                conversation_id=conversation_id,
-                role=role,
-                content=content
-            )
-            conversation.last_updated = datetime.utcnow()
-            session.add(message)
-            session.commit()
-            session.refresh(message)
-            return message
-        return None
+
+        if not owned:
+            return False
+
+        session.execute(insert(Message), [
+            {'conversation_id': conversation_id, 'role': role, 'content': content}
+            for role, content in messages
+        ])
+        session.query(Conversation).filter(
+            Conversation.id == conversation_id
+        ).update({'last_updated': func.now()}, synchronize_session=False)
+        return True
 
 
 def get_conversation_messages(conversation_id: int, user_id: int) -> List[Dict]:
-    """Get all messages in a conversation"""
-    with get_db_session() as session:
-        conversation = session.query(Conversation).filter(
+    """Get all messages in a conversation
+
+    Core select with the ownership check folded into the join: no
+    Conversation entity, no managed Message instances — just the three
+    columns the chat UI renders, straight into dicts.
+    """
+    with get_read_session() as session:
+        stmt = select(Message.role, Message.content, Message.created_at).join(
+            Conversation, Conversation.id == Message.conversation_id
+        ).where(
             Conversation.id == conversation_id,
             Conversation.user_id == user_id
-        ).first()
-        
-        if conversation:
-            return [
-                {
-                    'role': msg.role,
-                    'content': msg.content,
-                    'created_at': msg.created_at
-                }
-                for msg in conversation.messages
-            ]
-        return []
+        ).order_by(Message.created_at, Message.id)
+
+        return [
+            {'role': role, 'content': content, 'created_at': created_at}
+            for role, content, created_at in session.execute(stmt)
+        ]
 
 
 def delete_conversation(conversation_id: int, user_id: int) -> bool:
@@ -322,7 +554,6 @@ def delete_conversation(conversation_id: int, user_id: int) -> bool:
         
         if conversation:
             session.delete(conversation)
-            session.commit()
             return True
         return False
 
@@ -336,23 +567,23 @@ def save_analysis_result(pdf_id: int, analysis_type: str,
             pdf_id=pdf_id,
             conversation_id=conversation_id,
             analysis_type=analysis_type,
-            scope_inclusions=json.dumps(analysis_data.get('scope_inclusions', [])),
-            scope_exclusions=json.dumps(analysis_data.get('scope_exclusions', [])),
-            alternates=json.dumps(analysis_data.get('alternates', [])),
-            measurements=json.dumps(analysis_data.get('measurements', {})),
-            cost_estimates=json.dumps(analysis_data.get('cost_estimates', {})),
+            scope_inclusions=analysis_data.get('scope_inclusions', []),
+            scope_exclusions=analysis_data.get('scope_exclusions', []),
+            alternates=analysis_data.get('alternates', []),
+            measurements=analysis_data.get('measurements', {}),
+            cost_estimates=analysis_data.get('cost_estimates', {}),
             notes=analysis_data.get('notes', ''),
             confidence_score=analysis_data.get('confidence_score', 0.0)
         )
         session.add(result)
-        session.commit()
+        session.flush()
         session.refresh(result)
         return result
 
 
 def get_pdf_analysis_results(pdf_id: int, user_id: int) -> List[Dict]:
     """Get all analysis results for a PDF"""
-    with get_db_session() as session:
+    with get_read_session() as session:
         # First verify the PDF belongs to the user
         pdf = session.query(PDF).filter(
             PDF.id == pdf_id,
@@ -370,11 +601,11 @@ def get_pdf_analysis_results(pdf_id: int, user_id: int) -> List[Dict]:
             {
                 'id': result.id,
                 'analysis_type': result.analysis_type,
-                'scope_inclusions': json.loads(result.scope_inclusions) if result.scope_inclusions else [],
-                'scope_exclusions': json.loads(result.scope_exclusions) if result.scope_exclusions else [],
-                'alternates': json.loads(result.alternates) if result.alternates else [],
-                'measurements': json.loads(result.measurements) if result.measurements else {},
-                'cost_estimates': json.loads(result.cost_estimates) if result.cost_estimates else {},
+                'scope_inclusions': result.scope_inclusions or [],
+                'scope_exclusions': result.scope_exclusions or [],
+                'alternates': result.alternates or [],
+                'measurements': result.measurements or {},
+                'cost_estimates': result.cost_estimates or {},
                 'notes': result.notes,
                 'confidence_score': result.confidence_score,
                 'created_at': result.created_at
@@ -386,17 +617,21 @@ def get_pdf_analysis_results(pdf_id: int, user_id: int) -> List[Dict]:
 # Session State Management
 def get_user_session_data(user_id: int) -> Dict:
     """Get comprehensive user session data for Streamlit"""
-    with get_db_session() as session:
+    with get_read_session() as session:
         user = session.query(User).filter(User.id == user_id).first()
         
         if not user:
             return {}
         
-        recent_pdfs = session.query(PDF).filter(
+        recent_pdfs = session.query(
+            PDF.id, PDF.filename, PDF.project_name, PDF.uploaded_at
+        ).filter(
             PDF.user_id == user_id
         ).order_by(PDF.last_accessed.desc().nullslast(), PDF.uploaded_at.desc()).limit(5).all()
         
-        recent_conversations = session.query(Conversation).filter(
+        recent_conversations = session.query(Conversation).options(
+            joinedload(Conversation.pdf)
+        ).filter(
             Conversation.user_id == user_id
         ).order_by(Conversation.last_updated.desc()).limit(5).all()
         
@@ -427,3 +662,66 @@ def get_user_session_data(user_id: int) -> Dict:
                 for conv in recent_conversations
             ]
         }
+
+
+def get_user_profile_bundle(user_id: int) -> Dict:
+    """Everything the profile page needs in one session
+
+    Replaces the old pattern of get_user_session_data plus two full
+    list fetches that were only len()'d for the metric tiles: totals
+    come from COUNT(*) scalars and only the two 5-row recent lists are
+    transferred.
+    """
+    with get_read_session() as session:
+        user = session.query(User).filter(User.id == user_id).first()
+
+        if not user:
+            return {}
+
+        pdfs_count = session.query(func.count(PDF.id)).filter(
+            PDF.user_id == user_id).scalar()
+        convs_count = session.query(func.count(Conversation.id)).filter(
+            Conversation.user_id == user_id).scalar()
+
+        recent_pdfs = session.query(
+            PDF.id, PDF.filename, PDF.project_name, PDF.uploaded_at
+        ).filter(
+            PDF.user_id == user_id
+        ).order_by(PDF.last_accessed.desc().nullslast(), PDF.uploaded_at.desc()).limit(5).all()
+
+        recent_conversations = session.query(Conversation).options(
+            joinedload(Conversation.pdf)
+        ).filter(
+            Conversation.user_id == user_id
+        ).order_by(Conversation.last_updated.desc()).limit(5).all()
+
+        return {
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'full_name': user.full_name,
+                'company': user.company,
+                'created_at': user.created_at
+            },
+            'pdfs_count': pdfs_count,
+            'convs_count': convs_count,
+            'recent_pdfs': [
+                {
+                    'id': pdf.id,
+                    'filename': pdf.filename,
+                    'project_name': pdf.project_name,
+                    'uploaded_at': pdf.uploaded_at
+                }
+                for pdf in recent_pdfs
+            ],
+            'recent_conversations': [
+                {
+                    'id': conv.id,
+                    'title': conv.title,
+                    'pdf_filename': conv.pdf.filename if conv.pdf else None,
+                    'last_updated': conv.last_updated
+                }
+                for conv in recent_conversations
+            ]
+        }
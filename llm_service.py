@@ -2,13 +2,180 @@
 LLM Service - Handles both Claude and OpenAI implementations.
 """
 
+import asyncio
+import hashlib
 import os
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import List, Dict, Union, Optional
-from openai import OpenAI
-from anthropic import Anthropic
+import httpx
 import json
 
+try:
+    # orjson serializes 3-10x faster and skips the str round-trip;
+    # cache keys hash the bytes directly
+    import orjson
+
+    def _dumps_sorted(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS, default=str)
+except ImportError:
+    def _dumps_sorted(obj) -> bytes:
+        return json.dumps(obj, sort_keys=True, default=str).encode()
+
+try:
+    # SIMD-accelerated encoder for the raw-bytes image path; one encode
+    # at the API boundary instead of data-URL round-trips upstream
+    from pybase64 import b64encode_as_string as _b64encode_str
+    from pybase64 import b64decode as _b64decode
+except ImportError:
+    import base64 as _base64
+
+    def _b64encode_str(data: bytes) -> str:
+        return _base64.b64encode(data).decode()
+
+    _b64decode = _base64.b64decode
+
+# Connection pool sizing shared by both providers: enough keep-alive
+# slots to cover a full vision gather batch plus interactive chat, so
+# successive requests reuse warm TLS connections instead of paying a
+# fresh handshake each
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+_HTTP_TIMEOUT = httpx.Timeout(60.0)
+
+# Cap on in-flight requests per gather; keeps a large batch from
+# tripping provider rate limits or exhausting the connection pool
+_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Exact-match response cache: identical (messages, max_tokens,
+# temperature) requests at near-deterministic temperatures skip the
+# round-trip entirely. LRU-bounded and TTL'd, in-process
+_CACHE_TTL_SECONDS = 3600
+_CACHE_MAX_ENTRIES = 256
+_CACHEABLE_TEMPERATURE = 0.3
+_response_cache: "OrderedDict[str, tuple]" = OrderedDict()
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def _normalize_for_key(messages: List[Dict]) -> List[Dict]:
+    """Fold trivial rewordings (case, whitespace) into one cache key.
+
+    Only text is normalized, and only for key computation — numbers,
+    project names and image payloads pass through untouched, so two
+    prompts that differ in anything substantive still key apart.
+    """
+    normalized = []
+    for msg in messages:
+        content = msg.get("content")
+        if isinstance(content, str):
+            content = " ".join(content.casefold().split())
+        elif isinstance(content, list):
+            content = [
+                {**part, "text": " ".join(part.get("text", "").casefold().split())}
+                if isinstance(part, dict) and part.get("type") == "text" else part
+                for part in content
+            ]
+        normalized.append({"role": msg.get("role"), "content": content})
+    return normalized
+
+
+def _response_cache_key(messages, max_tokens, temperature, light=False) -> str:
+    return hashlib.sha256(_dumps_sorted(
+        {"messages": _normalize_for_key(messages), "max_tokens": max_tokens,
+         "temperature": temperature, "light": light}
+    )).hexdigest()
+
+
+def _response_cache_get(key: str) -> Optional[str]:
+    entry = _response_cache.get(key)
+    if entry is None or time.monotonic() - entry[0] > _CACHE_TTL_SECONDS:
+        cache_stats["misses"] += 1
+        return None
+    _response_cache.move_to_end(key)
+    cache_stats["hits"] += 1
+    return entry[1]
+
+
+def _response_cache_put(key: str, value: str) -> None:
+    _response_cache[key] = (time.monotonic(), value)
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > _CACHE_MAX_ENTRIES:
+        _response_cache.popitem(last=False)
+
+class RateLimiter:
+    """Proactive token bucket over request and token budgets.
+
+    Waits briefly before a request instead of burning a full round-trip
+    on a 429 and the exponential backoff that follows. Thread-safe, so
+    the fragment chat path and background analysis share one budget.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self._lock = threading.Lock()
+        self._rpm = rpm
+        self._tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._last = time.monotonic()
+
+    def acquire(self, estimated_tokens: int = 0) -> None:
+        """Block until one request plus estimated_tokens fit the budget."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._last
+                self._last = now
+                self._requests = min(float(self._rpm), self._requests + elapsed * self._rpm / 60.0)
+                self._tokens = min(float(self._tpm), self._tokens + elapsed * self._tpm / 60.0)
+                if self._requests >= 1.0 and self._tokens >= estimated_tokens:
+                    self._requests -= 1.0
+                    self._tokens -= estimated_tokens
+                    return
+                wait = max(
+                    (1.0 - self._requests) * 60.0 / self._rpm,
+                    (estimated_tokens - self._tokens) * 60.0 / self._tpm
+                )
+            time.sleep(min(max(wait, 0.01), 1.0))
+
+
+def _estimate_tokens(messages: List[Dict]) -> int:
+    """Rough request size: ~4 chars per text token, flat cost per image.
+
+    Good enough for pacing; an exact tokenizer would add a dependency
+    for no behavioral difference here.
+    """
+    total = 0
+    for msg in messages:
+        content = msg.get("content", "")
+        if isinstance(content, str):
+            total += len(content) // 4
+        elif isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    total += len(part.get("text", "")) // 4
+                else:
+                    total += 1000
+    return total
+
+
+_rate_limiter = RateLimiter(
+    rpm=int(os.getenv("LLM_RPM", "300")),
+    tpm=int(os.getenv("LLM_TPM", "150000")),
+)
+
+
+def _has_image_content(messages: List[Dict]) -> bool:
+    """Check whether any message carries image_url content blocks."""
+    for msg in messages:
+        content = msg.get("content")
+        if isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "image_url":
+                    return True
+    return False
+
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
     
@@ -17,9 +184,15 @@ class LLMProvider(ABC):
         self,
         messages: List[Dict[str, str]],
         max_tokens: int = 2000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        cache_key: Optional[str] = None,
+        light: bool = False
     ) -> str:
-        """Generate chat completion."""
+        """Generate chat completion.
+
+        light=True opts a text-only request into the cheap chat model;
+        analysis/synthesis callers keep the full model by default.
+        """
         pass
 
     @abstractmethod
@@ -32,26 +205,108 @@ class LLMProvider(ABC):
         """Generate completion for vision tasks."""
         pass
 
+    @abstractmethod
+    def vision_completion_batch(
+        self,
+        message_batches: List[List[Dict]],
+        max_tokens: int = 4000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Run several vision completions concurrently."""
+        pass
+
+    @abstractmethod
+    def chat_completion_batch(
+        self,
+        messages_list: List[List[Dict]],
+        max_tokens: int = 2000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Run several chat completions concurrently."""
+        pass
+
+    @abstractmethod
+    def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 2000,
+        temperature: float = 0.3,
+        cache_key: Optional[str] = None,
+        light: bool = False
+    ):
+        """Yield response text deltas as they arrive."""
+        pass
+
+    @abstractmethod
+    def chat_completion_samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int = 1,
+        max_tokens: int = 2000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Generate n candidate completions for the same prompt."""
+        pass
+
 
 class OpenAIProvider(LLMProvider):
     """OpenAI implementation."""
-    
+
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Imported here, not at module top: only one provider runs per
+        # process and each SDK costs real import time and memory
+        from openai import OpenAI, AsyncOpenAI
+
+        self.client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+        )
+        self._async_client_cls = AsyncOpenAI
         self.vision_model = "gpt-4-vision-preview"
         self.chat_model = "gpt-4-1106-preview"
-    
+        # Cheap model for simple text-only chat turns; callers opt in
+        # via light=True. Merge/synthesis calls stay on chat_model
+        self.light_model = os.getenv("OPENAI_TEXT_MODEL", "gpt-4o-mini")
+
+    def _async_client(self):
+        """Fresh async client for one batch call.
+
+        The batch entry points run under asyncio.run, which tears its
+        event loop down on return. A pooled AsyncClient shared across
+        calls keeps keep-alive connections bound to that dead loop, so
+        the next batch in the same process fails with 'Event loop is
+        closed'. A per-call client pays the handshakes once per batch;
+        connections are still reused across the fan-out within it.
+        """
+        return self._async_client_cls(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+        )
+
     def chat_completion(
         self,
         messages: List[Dict[str, str]],
         max_tokens: int = 2000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        cache_key: Optional[str] = None,
+        light: bool = False
     ) -> str:
+        # prompt_cache_key routes repeat requests with the same stable
+        # prefix (system prompt + earlier turns) to the same cache shard
+        extra = {"prompt_cache_key": cache_key} if cache_key else {}
+        # Image-bearing turns need the vision model; text turns use the
+        # cheap model only when the caller opted in (simple chat), never
+        # for analysis synthesis
+        if _has_image_content(messages):
+            model = self.vision_model
+        else:
+            model = self.light_model if light else self.chat_model
         response = self.client.chat.completions.create(
-            model=self.chat_model,
+            model=model,
             messages=messages,
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            **extra
         )
         return response.choices[0].message.content
 
@@ -69,15 +324,143 @@ class OpenAIProvider(LLMProvider):
         )
         return response.choices[0].message.content
 
+    def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 2000,
+        temperature: float = 0.3,
+        cache_key: Optional[str] = None,
+        light: bool = False
+    ):
+        """Yield response text deltas as they arrive."""
+        extra = {"prompt_cache_key": cache_key} if cache_key else {}
+        if _has_image_content(messages):
+            model = self.vision_model
+        else:
+            model = self.light_model if light else self.chat_model
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            **extra
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    def chat_completion_samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int = 1,
+        max_tokens: int = 2000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Sample n candidates in one request; input tokens are billed once."""
+        model = self.vision_model if _has_image_content(messages) else self.chat_model
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            n=n
+        )
+        return [choice.message.content for choice in response.choices]
+
+    def vision_completion_batch(
+        self,
+        message_batches: List[List[Dict]],
+        max_tokens: int = 4000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Overlap several vision requests with a per-call async client."""
+        async def _gather():
+            client = self._async_client()
+            try:
+                semaphore = asyncio.Semaphore(_MAX_CONCURRENCY)
+
+                async def _one(messages):
+                    async with semaphore:
+                        response = await client.chat.completions.create(
+                            model=self.vision_model,
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=temperature
+                        )
+                    return response.choices[0].message.content
+
+                return await asyncio.gather(*(_one(messages) for messages in message_batches))
+            finally:
+                await client.close()
+
+        return asyncio.run(_gather())
+
+    def chat_completion_batch(
+        self,
+        messages_list: List[List[Dict]],
+        max_tokens: int = 2000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Overlap several chat completions with a per-call async client."""
+        async def _gather():
+            client = self._async_client()
+            try:
+                semaphore = asyncio.Semaphore(_MAX_CONCURRENCY)
+
+                async def _one(messages):
+                    model = self.vision_model if _has_image_content(messages) else self.light_model
+                    async with semaphore:
+                        response = await client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=temperature
+                        )
+                    return response.choices[0].message.content
+
+                return await asyncio.gather(*(_one(messages) for messages in messages_list))
+            finally:
+                await client.close()
+
+        return asyncio.run(_gather())
+
 
 class ClaudeProvider(LLMProvider):
     """Claude implementation."""
-    
+
     def __init__(self):
-        self.client = Anthropic(api_key=os.getenv("CLAUDE_API_KEY"))
+        # Deferred for the same reason as the OpenAI imports
+        from anthropic import Anthropic, AsyncAnthropic
+
+        self.client = Anthropic(
+            api_key=os.getenv("CLAUDE_API_KEY"),
+            http_client=httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+        )
+        self._async_client_cls = AsyncAnthropic
         # Use a current, generally available Claude model
         self.model = os.getenv("CLAUDE_MODEL", "claude-3-5-sonnet-latest")
-    
+
+    def _async_client(self):
+        """Fresh async client for one batch call; see OpenAIProvider.
+
+        asyncio.run closes its loop on return, so a shared pooled
+        AsyncClient would hold connections bound to a dead loop.
+        """
+        return self._async_client_cls(
+            api_key=os.getenv("CLAUDE_API_KEY"),
+            http_client=httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+        )
+
+    @staticmethod
+    def _extract_text(response) -> str:
+        """Concatenate text blocks from a typed SDK response."""
+        return "".join(
+            part.text for part in (getattr(response, "content", None) or [])
+            if getattr(part, "type", None) == "text"
+        )
+
     def _oai_to_claude_blocks(self, content) -> List[Dict[str, Union[str, Dict[str, str]]]]:
         """Convert OpenAI-style message content (text + image_url blocks) to Anthropic blocks."""
         blocks = []
@@ -85,29 +468,51 @@ class ClaudeProvider(LLMProvider):
             for item in content:
                 if item.get("type") == "text":
                     blocks.append({"type": "text", "text": item.get("text", "")})
+                elif item.get("type") == "image_bytes":
+                    # Raw bytes from a producer that skipped the data-URL
+                    # detour entirely; encode once, right here
+                    blocks.append({
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": item.get("media_type", "image/jpeg"),
+                            "data": _b64encode_str(item["data"]),
+                        },
+                    })
                 elif item.get("type") == "image_url":
                     # Expect data URL like: data:image/png;base64,<base64>
                     url = item.get("image_url", {}).get("url", "")
+                    # Locate the header/payload boundary once; every
+                    # split() of a multi-MB data URL copies the whole
+                    # base64 payload just to find this comma
+                    comma = url.find(",")
+                    if comma < 0:
+                        continue
                     if url.startswith("data:application/pdf"):
                         # Handle PDF data URL if ever passed
-                        b64_data = url.split(",", 1)[1]
                         blocks.append({
                             "type": "document",
                             "source": {
                                 "type": "base64",
                                 "media_type": "application/pdf",
-                                "data": b64_data,
+                                "data": url[comma + 1:],
                             },
                         })
                     elif url.startswith("data:image/"):
-                        # Handle image data URL
-                        media_type = url.split(":", 1)[1].split(";", 1)[0]
-                        b64_data = url.split(",", 1)[1]
-                        # Heuristic fix: ensure media_type matches data by checking common base64 signatures
-                        head = b64_data[:10]
-                        if head.startswith("iVBORw0KG"):
+                        # Handle image data URL: header is tiny, slice it
+                        # apart; the payload is copied exactly once
+                        media_type = url[5:comma].partition(";")[0]
+                        b64_data = url[comma + 1:]
+                        # Ensure media_type matches data: decode the
+                        # first 12 chars (9 bytes) and check real magic
+                        # numbers instead of base64-prefix string quirks
+                        try:
+                            magic = _b64decode(b64_data[:12])
+                        except Exception:
+                            magic = b""
+                        if magic.startswith(b"\x89PNG"):
                             media_type = "image/png"
-                        elif head.startswith("/9j/"):
+                        elif magic.startswith(b"\xff\xd8\xff"):
                             media_type = "image/jpeg"
                         blocks.append({
                             "type": "image",
@@ -126,15 +531,32 @@ class ClaudeProvider(LLMProvider):
         self,
         messages: List[Dict[str, Union[str, List[Dict[str, Union[str, Dict[str, str]]]]]]]
     ) -> (Optional[str], List[Dict[str, Union[str, List[Dict[str, str]]]]]):
-        """Split out system prompt and convert remaining messages into Claude format with blocks."""
-        system_message = next((msg["content"] for msg in messages if msg.get("role") == "system"), None)
+        """Split out system prompt and convert remaining messages into Claude format with blocks.
+
+        One pass: the system prompt is picked up in the same loop that
+        converts the rest, instead of a separate scan first. Only the
+        first system message becomes the API's system field; later ones
+        (e.g. the mid-transcript summary _compact_history splices in)
+        carry real conversation state, so they are folded into the turn
+        sequence as user text rather than dropped.
+        """
+        system_message = None
         claude_messages = []
         for msg in messages:
             role = msg.get("role")
             if role == "system":
+                if system_message is None:
+                    system_message = msg.get("content")
+                else:
+                    claude_messages.append({
+                        "role": "user",
+                        "content": [{
+                            "type": "text",
+                            "text": f"[Context] {msg.get('content', '')}",
+                        }],
+                    })
                 continue
-            content = msg.get("content", "")
-            blocks = self._oai_to_claude_blocks(content)
+            blocks = self._oai_to_claude_blocks(msg.get("content", ""))
             claude_messages.append({"role": role, "content": blocks})
         return system_message, claude_messages
 
@@ -142,8 +564,12 @@ class ClaudeProvider(LLMProvider):
         self,
         messages: List[Dict[str, Union[str, List[Dict[str, Union[str, Dict[str, str]]]]]]],
         max_tokens: int = 2000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        cache_key: Optional[str] = None,
+        light: bool = False
     ) -> str:
+        # cache_key and light are accepted for interface parity; Anthropic
+        # prefix caching keys on content, and this provider runs one model
         system_message, claude_messages = self._convert_to_claude_messages(messages)
         response = self.client.beta.messages.create(
             model=self.model,
@@ -153,13 +579,7 @@ class ClaudeProvider(LLMProvider):
             messages=claude_messages,
         )
         # Concatenate text blocks from the first response message
-        parts = []
-        for part in getattr(response, "content", []) or []:
-            if isinstance(part, dict) and part.get("type") == "text":
-                parts.append(part.get("text", ""))
-            elif hasattr(part, "text"):
-                parts.append(getattr(part, "text"))
-        return "".join(parts) if parts else (getattr(response, "content", "") or "")
+        return self._extract_text(response)
 
     def vision_completion(
         self,
@@ -175,13 +595,106 @@ class ClaudeProvider(LLMProvider):
             system=system_message,
             messages=claude_messages,
         )
-        parts = []
-        for part in getattr(response, "content", []) or []:
-            if isinstance(part, dict) and part.get("type") == "text":
-                parts.append(part.get("text", ""))
-            elif hasattr(part, "text"):
-                parts.append(getattr(part, "text"))
-        return "".join(parts) if parts else (getattr(response, "content", "") or "")
+        return self._extract_text(response)
+
+    def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 2000,
+        temperature: float = 0.3,
+        cache_key: Optional[str] = None,
+        light: bool = False
+    ):
+        """Yield response text deltas as they arrive."""
+        system_message, claude_messages = self._convert_to_claude_messages(messages)
+        stream = self.client.beta.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=system_message,
+            messages=claude_messages,
+            stream=True,
+        )
+        for event in stream:
+            if getattr(event, "type", None) == "content_block_delta":
+                text = getattr(getattr(event, "delta", None), "text", None)
+                if text:
+                    yield text
+
+    def chat_completion_samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int = 1,
+        max_tokens: int = 2000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """The Anthropic API has no n parameter; fall back to concurrent calls."""
+        if n <= 1:
+            return [self.chat_completion(messages, max_tokens, temperature)]
+
+        system_message, claude_messages = self._convert_to_claude_messages(messages)
+
+        async def _gather():
+            client = self._async_client()
+            try:
+                async def _one():
+                    response = await client.beta.messages.create(
+                        model=self.model,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        system=system_message,
+                        messages=claude_messages,
+                    )
+                    return self._extract_text(response)
+
+                return await asyncio.gather(*(_one() for _ in range(n)))
+            finally:
+                await client.close()
+
+        return asyncio.run(_gather())
+
+    def vision_completion_batch(
+        self,
+        message_batches: List[List[Dict]],
+        max_tokens: int = 4000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Overlap several vision requests with a per-call async client."""
+        converted = [self._convert_to_claude_messages(messages) for messages in message_batches]
+
+        async def _gather():
+            client = self._async_client()
+            try:
+                semaphore = asyncio.Semaphore(_MAX_CONCURRENCY)
+
+                async def _one(system_message, claude_messages):
+                    async with semaphore:
+                        response = await client.beta.messages.create(
+                            model=self.model,
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            system=system_message,
+                            messages=claude_messages,
+                        )
+                    return self._extract_text(response)
+
+                return await asyncio.gather(
+                    *(_one(system_message, claude_messages)
+                      for system_message, claude_messages in converted)
+                )
+            finally:
+                await client.close()
+
+        return asyncio.run(_gather())
+
+    def chat_completion_batch(
+        self,
+        messages_list: List[List[Dict]],
+        max_tokens: int = 2000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Overlap several chat completions; one model, same path as vision."""
+        return self.vision_completion_batch(messages_list, max_tokens, temperature)
 
 
 class LLMService:
@@ -207,10 +720,40 @@ class LLMService:
         self,
         messages: List[Dict[str, str]],
         max_tokens: int = 2000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        cache_key: Optional[str] = None,
+        light: bool = False
     ) -> str:
-        """Generate chat completion using the configured provider."""
-        return self.provider.chat_completion(messages, max_tokens, temperature)
+        """Generate chat completion using the configured provider.
+
+        Exact repeats at near-deterministic temperatures are served from
+        the in-process response cache without an API call. light=True
+        routes text-only requests to the cheap chat model (keyed apart
+        in the cache, since the two models answer differently).
+        """
+        cacheable = temperature <= _CACHEABLE_TEMPERATURE
+        if cacheable:
+            key = _response_cache_key(messages, max_tokens, temperature, light)
+            cached = _response_cache_get(key)
+            if cached is not None:
+                return cached
+        _rate_limiter.acquire(_estimate_tokens(messages))
+        response = self.provider.chat_completion(messages, max_tokens, temperature, cache_key, light)
+        if cacheable:
+            _response_cache_put(key, response)
+        return response
+
+    def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 2000,
+        temperature: float = 0.3,
+        cache_key: Optional[str] = None,
+        light: bool = False
+    ):
+        """Stream chat completion text deltas using the configured provider."""
+        _rate_limiter.acquire(_estimate_tokens(messages))
+        return self.provider.chat_completion_stream(messages, max_tokens, temperature, cache_key, light)
     
     def vision_completion(
         self,
@@ -219,4 +762,37 @@ class LLMService:
         temperature: float = 0.3
     ) -> str:
         """Generate completion for vision tasks using the configured provider."""
-        return self.provider.vision_completion(messages, max_tokens, temperature)
\ No newline at end of file
+        _rate_limiter.acquire(_estimate_tokens(messages))
+        return self.provider.vision_completion(messages, max_tokens, temperature)
+
+    def vision_completion_batch(
+        self,
+        message_batches: List[List[Dict]],
+        max_tokens: int = 4000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Run multiple vision completions concurrently using the configured provider."""
+        for messages in message_batches:
+            _rate_limiter.acquire(_estimate_tokens(messages))
+        return self.provider.vision_completion_batch(message_batches, max_tokens, temperature)
+
+    def chat_completion_samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int = 1,
+        max_tokens: int = 2000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Generate n candidate completions using the configured provider."""
+        return self.provider.chat_completion_samples(messages, n, max_tokens, temperature)
+
+    def run_many(
+        self,
+        messages_list: List[List[Dict]],
+        max_tokens: int = 2000,
+        temperature: float = 0.3
+    ) -> List[str]:
+        """Run independent prompts concurrently, bounded by LLM_MAX_CONCURRENCY."""
+        for messages in messages_list:
+            _rate_limiter.acquire(_estimate_tokens(messages))
+        return self.provider.chat_completion_batch(messages_list, max_tokens, temperature)
\ No newline at end of file
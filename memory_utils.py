@@ -6,9 +6,14 @@ Handles session state cleanup and memory monitoring
 import streamlit as st
 import gc
 import sys
+import time
 from typing import Dict, Any, Optional, List
 import psutil
-import os
+
+# Built once: each psutil.Process() construction re-reads /proc/<pid>,
+# and the memory widget polls this every render
+_PROC = psutil.Process()
+
 
 class SessionStateManager:
     """Manages Streamlit session state memory efficiently"""
@@ -24,34 +29,50 @@ class SessionStateManager:
         'full_name', 'company', 'page', 'pdf_processor'
     }
     
+    # One sizing pass is reused by every reader for this long (seconds)
+    _MEM_CACHE_TTL = 2.0
+
     @staticmethod
-    def get_session_size() -> float:
-        """Get approximate size of session state in MB"""
-        total_size = 0
+    def _session_sizes() -> List[tuple]:
+        """Size every session entry in one pass, cached for ~2 seconds.
+
+        Containers get the deep get_object_size treatment (a shallow
+        sys.getsizeof on a list of data-URL strings reports almost
+        nothing); scalars keep the cheap shallow size.
+        """
+        cached = st.session_state.get('_mem_cache')
+        now = time.monotonic()
+        if cached and now - cached[0] < SessionStateManager._MEM_CACHE_TTL:
+            return cached[1]
+
+        sizes = []
         for key, value in st.session_state.items():
+            if key == '_mem_cache':
+                continue
             try:
-                # Get size of each item
                 size = sys.getsizeof(value)
-                # For complex objects, try to get deeper size
-                if hasattr(value, '__dict__'):
-                    size += sys.getsizeof(value.__dict__)
-                total_size += size
-            except:
+                if isinstance(value, (dict, list, tuple, set)) or size > 65536:
+                    size = get_object_size(value)
+                sizes.append((key, size))
+            except Exception:
                 # Skip items that can't be measured
                 continue
-        return total_size / (1024 * 1024)
-    
+        st.session_state['_mem_cache'] = (now, sizes)
+        return sizes
+
+    @staticmethod
+    def get_session_size() -> float:
+        """Get approximate size of session state in MB"""
+        return sum(size for _, size in SessionStateManager._session_sizes()) / (1024 * 1024)
+
     @staticmethod
     def get_large_items() -> List[tuple]:
-        """Get list of large items in session state"""
-        items = []
-        for key, value in st.session_state.items():
-            try:
-                size_mb = sys.getsizeof(value) / (1024 * 1024)
-                if size_mb > 1:  # Items larger than 1MB
-                    items.append((key, size_mb))
-            except:
-                continue
+        """Get list of (key, size_mb) for items larger than 1MB"""
+        items = [
+            (key, size / (1024 * 1024))
+            for key, size in SessionStateManager._session_sizes()
+            if size > 1024 * 1024
+        ]
         return sorted(items, key=lambda x: x[1], reverse=True)
     
     @staticmethod
@@ -82,25 +103,61 @@ class SessionStateManager:
         gc.collect()
     
     @staticmethod
-    def optimize_messages(max_messages: int = 50):
-        """Keep only recent messages to save memory"""
-        if 'messages' in st.session_state:
-            messages = st.session_state.messages
-            if len(messages) > max_messages:
-                # Keep system message and last N messages
-                system_msg = [m for m in messages if m.get('role') == 'system']
-                other_msgs = [m for m in messages if m.get('role') != 'system']
-                # Keep more recent messages with higher limit
-                st.session_state.messages = system_msg + other_msgs[-max_messages:]
-                # Force cleanup after trimming messages
-                gc.collect()
+    def _estimate_tokens(message: Dict) -> int:
+        """~4 chars per token for text, flat cost per image block.
+
+        Counting a data-URL payload at face value would put a single
+        attached page at 50k+ "tokens" and blow the whole budget on one
+        turn; the wire copy drops old images anyway (_prune_image_history),
+        so images cost what the provider charges — a flat amount.
+        """
+        content = message.get('content', '')
+        if isinstance(content, list):
+            total = 0
+            for part in content:
+                if isinstance(part, dict) and part.get('type') == 'text':
+                    total += len(part.get('text', '')) // 4
+                else:
+                    total += 1000
+            return total
+        return len(str(content)) // 4
+
+    @staticmethod
+    def optimize_messages(max_messages: int = 50, max_tokens: int = 8000):
+        """Keep only recent messages, bounded by tokens and count
+
+        Walks from the newest message backwards accumulating estimated
+        tokens, so one giant vision turn can't sneak a full budget's
+        worth of history past a pure message-count cap.
+        """
+        if 'messages' not in st.session_state:
+            return
+        messages = st.session_state.messages
+        system_msg = [m for m in messages if m.get('role') == 'system']
+        other_msgs = [m for m in messages if m.get('role') != 'system']
+
+        kept = []
+        budget = max_tokens
+        for msg in reversed(other_msgs[-max_messages:]):
+            budget -= SessionStateManager._estimate_tokens(msg)
+            if budget < 0 and kept:
+                break
+            kept.append(msg)
+        kept.reverse()
+
+        if len(kept) < len(other_msgs):
+            # Trim in place: callers (chat_with_context mid-turn) hold a
+            # reference to this list, and rebinding the key would leave
+            # them appending to an orphaned copy
+            messages[:] = system_msg + kept
+            # Force cleanup after trimming messages
+            gc.collect()
     
     @staticmethod
     def check_memory_usage() -> Dict:
         """Check current memory usage and provide recommendations"""
         session_size = SessionStateManager.get_session_size()
-        process = psutil.Process(os.getpid())
-        memory_info = process.memory_info()
+        memory_info = _PROC.memory_info()
         
         status = "normal"
         if session_size > SessionStateManager.MAX_SESSION_SIZE_MB:
@@ -221,23 +278,36 @@ def cleanup_old_pdfs_from_session():
 
 
 def get_object_size(obj: Any) -> int:
-    """Get deep size of an object"""
+    """Get deep size of an object
+
+    Iterative walk over gc.get_referents with an explicit stack — no
+    recursion limit, and no descending into ORM instances, modules,
+    classes or frames. Following a mapped object's relationships would
+    otherwise drag the entire SQLAlchemy identity map into the count.
+    """
+    import types
+    try:
+        from models import Base as _orm_base
+    except Exception:
+        _orm_base = None
+
     seen_ids = set()
-    
-    def sizeof(o):
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
         if id(o) in seen_ids:
-            return 0
+            continue
         seen_ids.add(id(o))
-        
-        size = sys.getsizeof(o)
-        
-        if isinstance(o, dict):
-            size += sum(sizeof(k) + sizeof(v) for k, v in o.items())
-        elif hasattr(o, '__iter__') and not isinstance(o, (str, bytes, bytearray)):
-            size += sum(sizeof(item) for item in o)
-        elif hasattr(o, '__dict__'):
-            size += sizeof(o.__dict__)
-        
-        return size
-    
-    return sizeof(obj)
\ No newline at end of file
+
+        if isinstance(o, (types.ModuleType, types.FunctionType,
+                          types.FrameType, type)):
+            continue
+        total += sys.getsizeof(o)
+        if isinstance(o, (str, bytes, bytearray)):
+            continue
+        if _orm_base is not None and isinstance(o, _orm_base):
+            # Counted shallow; stop at the ORM boundary
+            continue
+        stack.extend(gc.get_referents(o))
+    return total
\ No newline at end of file
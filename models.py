@@ -4,12 +4,27 @@ SQLAlchemy database models for PaintScope
 
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, LargeBinary, Float
+from sqlalchemy import create_engine, event, Column, Index, Integer, String, Text, DateTime, ForeignKey, LargeBinary, Float, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker, Session
 from sqlalchemy.sql import func
 import bcrypt
 import os
+import time
+
+try:
+    # 3-10x faster than stdlib json for the analysis-field columns
+    import orjson
+
+    def _json_serializer(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    _json_deserializer = orjson.loads
+except ImportError:
+    import json as _json
+    _json_serializer = _json.dumps
+    _json_deserializer = _json.loads
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///paintscope.db")
@@ -21,16 +36,58 @@ if DATABASE_URL.startswith("postgres://"):
 # Create base class for models
 Base = declarative_base()
 
+# JSON on SQLite (stored as TEXT), JSONB on Postgres
+_JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
 # Create engine with appropriate settings
 if DATABASE_URL.startswith("sqlite"):
     # SQLite settings
-    engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
+    engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False},
+                           json_serializer=_json_serializer, json_deserializer=_json_deserializer)
+
+    # SQLite ships with foreign keys off; the ON DELETE CASCADE / SET NULL
+    # clauses on our FKs only fire with enforcement enabled
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        # WAL lets readers proceed during writes — several Streamlit
+        # session threads share this one database file
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
 else:
-    # PostgreSQL settings
-    engine = create_engine(DATABASE_URL, echo=False, pool_size=10, max_overflow=20)
+    # PostgreSQL settings. Hosted providers kill idle connections;
+    # pre-ping catches a dead one before the query and recycle retires
+    # connections before the server's idle timeout does
+    engine = create_engine(DATABASE_URL, echo=False, pool_size=10, max_overflow=20,
+                           pool_pre_ping=True, pool_recycle=1800,
+                           json_serializer=_json_serializer, json_deserializer=_json_deserializer)
+
+# Create session factory. expire_on_commit=False keeps attribute values
+# loaded on objects returned past the session's closing commit, so the
+# service layer can commit once on exit without detached-access errors
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _calibrate_password_cost(target_ms: int = 250, start: int = 10) -> int:
+    """Find the highest bcrypt cost that stays under target_ms here"""
+    cost = start
+    while True:
+        begin = time.perf_counter()
+        bcrypt.hashpw(b'calibration-only', bcrypt.gensalt(cost))
+        if (time.perf_counter() - begin) * 1000 >= target_ms:
+            return cost
+        cost += 1
+
+
+# Work factor for new password hashes. Override with PW_COST, or set
+# PW_CALIBRATE=1 to measure a ~250ms cost on this machine at startup
+# (one-off hashing burst, so it's opt-in). Verification always uses the
+# cost embedded in the stored hash.
+PASSWORD_COST = int(
+    os.getenv('PW_COST')
+    or (_calibrate_password_cost() if os.getenv('PW_CALIBRATE') else 12)
+)
 
 
 class User(Base):
@@ -53,7 +110,7 @@ class User(Base):
     
     def set_password(self, password: str):
         """Hash and set password"""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(PASSWORD_COST)).decode('utf-8')
     
     def verify_password(self, password: str) -> bool:
         """Verify password against hash"""
@@ -71,8 +128,9 @@ class PDF(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     filename = Column(String(255), nullable=False)
-    file_data = Column(LargeBinary, nullable=False)
-    file_size = Column(Integer)
+    file_size = Column(Integer)  # original (uncompressed) size in bytes
+    compression = Column(String(10))  # 'zstd' or None for raw bytes
+    content_hash = Column(String(32), index=True)  # BLAKE2b-128 of raw bytes, for dedup
     page_count = Column(Integer)
     project_name = Column(String(255))
     project_address = Column(String(500))
@@ -84,6 +142,8 @@ class PDF(Base):
     user = relationship("User", back_populates="pdfs")
     conversations = relationship("Conversation", back_populates="pdf")
     analysis_results = relationship("AnalysisResult", back_populates="pdf", cascade="all, delete-orphan")
+    pages = relationship("PDFPage", back_populates="pdf", cascade="all, delete-orphan")
+    blob = relationship("PDFBlob", back_populates="pdf", uselist=False, cascade="all, delete-orphan")
     
     def update_last_accessed(self):
         """Update last accessed timestamp"""
@@ -97,6 +157,36 @@ class PDF(Base):
         return 0.0
 
 
+class PDFBlob(Base):
+    """Raw PDF bytes, split out of the pdfs row
+
+    Every metadata query against pdfs stays light; the blob only crosses
+    the wire when a caller explicitly asks for the file contents.
+    """
+    __tablename__ = "pdf_blobs"
+
+    pdf_id = Column(Integer, ForeignKey("pdfs.id", ondelete="CASCADE"), primary_key=True)
+    file_data = Column(LargeBinary, nullable=False)
+
+    # Relationships
+    pdf = relationship("PDF", back_populates="blob")
+
+
+class PDFPage(Base):
+    """Rendered PDF page image, persisted so loads don't re-rasterize"""
+    __tablename__ = "pdf_pages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pdf_id = Column(Integer, ForeignKey("pdfs.id", ondelete="CASCADE"), nullable=False, index=True)
+    page_num = Column(Integer, nullable=False)
+    quality = Column(String(10), nullable=False, default='medium')  # 'low', 'medium', 'high'
+    image_data = Column(LargeBinary, nullable=False)  # raw JPEG bytes (base64-encoded on read)
+    created_at = Column(DateTime, server_default=func.now())
+
+    # Relationships
+    pdf = relationship("PDF", back_populates="pages")
+
+
 class Conversation(Base):
     """Conversation/chat session model"""
     __tablename__ = "conversations"
@@ -112,7 +202,10 @@ class Conversation(Base):
     # Relationships
     user = relationship("User", back_populates="conversations")
     pdf = relationship("PDF", back_populates="conversations")
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan", order_by="Message.created_at")
+    # id tiebreaks equal timestamps: bulk-inserted user+assistant pairs
+    # share one created_at (now() is transaction-stable on Postgres and
+    # second-resolution on SQLite)
+    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan", order_by="Message.created_at, Message.id")
     analysis_results = relationship("AnalysisResult", back_populates="conversation")
     
     def add_message(self, role: str, content: str) -> "Message":
@@ -134,7 +227,12 @@ class Conversation(Base):
 class Message(Base):
     """Individual message in a conversation"""
     __tablename__ = "messages"
-    
+    # Conversation loads read WHERE conversation_id = ? ORDER BY
+    # created_at; the composite index makes that a range scan
+    __table_args__ = (
+        Index("ix_messages_conv_created", "conversation_id", "created_at"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
     role = Column(String(20), nullable=False)  # 'user', 'assistant', 'system'
@@ -154,12 +252,14 @@ class AnalysisResult(Base):
     conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="SET NULL"))
     analysis_type = Column(String(50))  # 'initial', 'detailed', 'takeoff', 'custom'
     
-    # Analysis data fields
-    scope_inclusions = Column(Text)  # JSON string
-    scope_exclusions = Column(Text)  # JSON string
-    alternates = Column(Text)  # JSON string
-    measurements = Column(Text)  # JSON string
-    cost_estimates = Column(Text)  # JSON string
+    # Analysis data fields — native JSON columns (JSONB on Postgres), so
+    # the driver handles (de)serialization and queries can push into the
+    # structure server-side
+    scope_inclusions = Column(_JSONType)
+    scope_exclusions = Column(_JSONType)
+    alternates = Column(_JSONType)
+    measurements = Column(_JSONType)
+    cost_estimates = Column(_JSONType)
     notes = Column(Text)
     
     # Metadata